@@ -31,124 +31,246 @@ Write data to another directory
 In[]: cd Dropbox/peach/era5
 In[]: %run jscat.py 2018_01 ./data
 
+Catalogue the globe in 30 deg longitude tiles, 4 tiles at a time
+(the lon range may also cross the dateline, e.g. --lon 150 -130)
+In[]: %run jscat.py 2018_01 ./data --lon -180 180 --lat -90 90 --tile-size 30 --workers 4
+
+Catalogue several regions (see REGIONS) from one get of the data of
+their union, each to its own directory e.g. ./data/NPAC/js_2018_01.txt
+In[]: %run jscat.py 2018_01 ./data --regions NA NATL NPAC
+
+Keep the catalog of the current month up to date, e.g. hourly from
+cron, getting and appending only the time steps published since the
+last run (a binary catalog js_YYYY_MM.npy with --format npy)
+$ python jscat.py $(date -u +%Y_%m) ./data --tail
+
+Find jets with the compiled (numba) backend and check they are the
+same as found by the reference (skimage) backend
+In[]: %run jscat.py 2018_01 ./data --backend numba --check skimage
+
 """
 #
 import time
-import sys
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
 from jsutil import *
 
-def do_jscat(yyyy_mm, outdir):
-    dapdir = 'http://whewell.marine.unc.edu/dods/era5' # 0/80 N
+dapdir = 'http://whewell.marine.unc.edu/dods/era5' # 0/80 N
+
+# regions catalogued together by do_jscat_regions(), each a BB (lon, lat, lvl)
+REGIONS = { 'NA'  : dict(lon=[-140, -50], lat=[ 0, 80], lvl=[100, 500]),
+            'NATL': dict(lon=[ -80,   0], lat=[20, 80], lvl=[100, 500]),
+            'NPAC': dict(lon=[ 140,-120], lat=[20, 70], lvl=[100, 500]),
+            }
+
+def do_jscat(yyyy_mm, outdir, BB=None, tile_size=None, workers=1, read_workers=1,
+             lm=None, cache=False, backend='skimage', check=None, fmt='txt', tail=False):
+    """Catalogue jets for one month within BB and write js_YYYY_MM.txt
+
+    With tail=True only the time steps of the month that are newer than
+    the last jet in an existing catalog, and that all params have, are
+    got and appended to it, so it can be run on a schedule to keep the
+    catalog of the current month up to date.  Runs at once take turns
+    (see catalog_lock), so each time step is appended once.
+
+    Parameters
+    ----------
+    yyyy_mm : str
+       year and month to catalogue
+    outdir : str
+       directory for the output file
+    BB : dictionary
+       data bounds (lon, lat, lvl) for analysis, default is North America.
+       The lon range may cross the dateline or be global e.g. [-180, 180].
+    tile_size : float
+       if given, split the lon range in tiles of tile_size degrees and get
+       and process each tile independently, so memory depends on tile size
+    workers : int
+       number of processes to work through the tiles in parallel
+    read_workers : int
+       number of processes to read each param of a tile (see get_data)
+    lm : dict
+       params for find_jets() that differ from the defaults
+    cache : bool
+       keep source datasets open for the next call (see get_data)
+    backend : str
+       find_jets() backend, 'skimage' (reference) or 'numba'
+    check : str
+       if given, also find jets with this backend and report differences
+    fmt : str
+       catalog as 'txt' (text table with header) or 'npy' (binary
+       records, see jet_records)
+    tail : bool
+       append new time steps to the catalog, or write it if none yet
+
+    Returns
+    -------
+    ofn : str
+       path of the catalog written
+    """
     # Define default data bounds for analysis
-    BB = dict( lon=[-140, -50],
-               lat=[   0,  80],
-               lvl=[ 100, 500],
-               dt = [datetime.datetime(2017,1,1), datetime.datetime(2017,2,1)]
-               )
+    if BB is None:
+        BB = dict( lon=[-140, -50],
+                   lat=[   0,  80],
+                   lvl=[ 100, 500],
+                   dt = [datetime.datetime(2017,1,1), datetime.datetime(2017,2,1)]
+                   )
     BB['dt'] = find_months(yyyy_mm)
+    month = BB['dt']
 
-    print(f"Getting data for {yyyy_mm} ... ")
-    # tic = time.perf_counter()
-    d = get_data(dapdir, BB)
-    # toc = time.perf_counter()
-    # print(f" ... Time: {toc - tic:0.4f} seconds")
-
-    # setup params for find_jets() algo
-    lm = { 'num_peaks' : 4,
-           'min_distance' : 3,
-           'exclude_border' : 0,
-           'threshold_abs': 40.,
-           #
-           'peaks_inside_toggle': 1,
-           'peaks_inside_threshold': 30.,
-           'peaks_inside_zonal_max': 0}
-
-    # for a given time find jet stream(s) 3D indices 
-    # dtidx = 0
-    # jsidx = find_jets(d,dtidx,lm)
-
-    jsidx = np.empty((0,4), dtype=int)
-    print(f"Finding jets ... ")
-    # tic = time.perf_counter()
-    for dtidx, dt in enumerate(d['dt']):
-        jsi = find_jets(d,dtidx,lm)
-        jsidx = np.vstack((jsidx,jsi))
-    # toc = time.perf_counter()
-    # print(f" ... Time: {toc - tic:0.4f} seconds")
-
-    # get location data values from indices
-    # this helps cleanup notation
-    idxdt, idxlvl, idxlat, idxlon = jsidx[:,0],jsidx[:,1],jsidx[:,2],jsidx[:,3]
-
-    # initialize js1 array to hold data (minus JSDT)
-    types_str='JSLVL JSLAT JSLON JSHT WSPD UWND VWND HGT'
-    c = generate_columns(types_str)
-    
-    nrows, _ = jsidx.shape
-    ncols = len(c)
-    js1 = np.ones(shape=(nrows,ncols))*np.nan
-    dt = np.zeros(shape=(nrows,1), dtype='U25') 
-    
-    # get datetimes but convert to string YYYYMMDD_HHMM first for writing to file
-    for i, idx in enumerate(idxdt):
-        # js[i,c['JSDT']] 
-        dt[i] = d['dt'][idx].strftime("  %Y %m %d %H %M %S")
-
-    # get position data
-    js1[:,c['JSLAT']] = d['lat'][idxlat]
-    js1[:,c['JSLON']] = d['lon'][idxlon]
-    js1[:,c['JSLVL']] = d['level'][idxlvl]
-    
-    # get parameter data from indices metpy (dot.m)
-    js1[:,c['WSPD']] = d['wspd'][idxdt, idxlvl, idxlat, idxlon]
-    js1[:,c['UWND']] = d['uwnd'][idxdt, idxlvl, idxlat, idxlon]
-    js1[:,c['VWND']] = d['vwnd'][idxdt, idxlvl, idxlat, idxlon]
-    js1[:,c['HGT']] = d['hgt'][idxdt, idxlvl, idxlat, idxlon]
-    
-    # compute geometric altitude (height) from pressure level 
-    # adjusted for msl pressure at time, lat, lon
-    pdiff= d['pdiff'][idxdt, idxlat, idxlon] # pdiff is msl(dt,lat,lon)-1013.25 hPa 
-    hts = metpy.calc.add_pressure_to_height(d['ht_std'][idxlvl], pdiff)
-    js1[:,c['JSHT']] = hts.m
-    
-    # pre-pend column of dates to rest of js data
-    # this will cause the js1 data to be printed as strings 
-    # but that is okay at this step because we are ready to write
-    # this out to a text file.
-    js = np.column_stack((dt, js1))
-    types_str = 'YYYY MM DD hh mm ss ' + types_str
+    fn = f"js_{yyyy_mm}.{fmt}"
+    ofn = '/'.join([outdir, fn])
+    # one tail run at a time reads the last jet and appends after it,
+    # e.g. from cron when a run takes longer than the schedule
+    lock = catalog_lock(ofn) if tail else contextlib.nullcontext()
+    with lock:
+        append = tail and os.path.exists(ofn)
+        if tail:
+            # the source has new time steps, so coordinates kept open are stale
+            close_datasets()
+            dt = available_times(dapdir, month, cache)
+            if append:
+                last = last_jet_time(ofn)
+                if last is not None:
+                    dt = dt[dt > last]
+            if len(dt) == 0:
+                print(f"No new time steps for {yyyy_mm} in {ofn}")
+                return ofn
+            # get only the new time steps
+            BB = dict(BB, dt=[dt[0], dt[-1] + datetime.timedelta(seconds=1)])
+            print(f"{len(dt)} new time step(s) {dt[0]} to {dt[-1]}")
+
+        # setup params for find_jets() algo
+        lm = dict(jet_params, **(lm or {}))
+
+        # for a given time find jet stream(s) 3D indices 
+        # dtidx = 0
+        # jsidx = find_jets(d,dtidx,lm)
+
+        if tile_size:
+            tiles = lon_tiles(BB['lon'], tile_size)
+        else:
+            tiles = [dict(lon=BB['lon'], closed=True)]
+        tile_BBs = [dict(BB, lon=tile['lon'], lon_closed=tile['closed']) for tile in tiles]
 
+        print(f"Getting data and finding jets for {yyyy_mm} in {len(tiles)} tile(s) ... ")
+        # tic = time.perf_counter()
+        if workers > 1 and len(tiles) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(catalog_jets, itertools.repeat(dapdir), tile_BBs,
+                                        itertools.repeat(lm), itertools.repeat(read_workers),
+                                        itertools.repeat(cache), itertools.repeat(backend),
+                                        itertools.repeat(check)))
+        else:
+            results = [catalog_jets(dapdir, tile_BB, lm, read_workers, cache, backend, check)
+                       for tile_BB in tile_BBs]
+        # toc = time.perf_counter()
+        # print(f" ... Time: {toc - tic:0.4f} seconds")
+
+        # merge tiles into one catalog, ordered by date and time then
+        # eastward by tile (stable sort keeps tile and lon order within a time)
+        js = np.vstack([js for js, types_str in results])
+        types_str = results[0][1]
+        js = js[np.argsort(js[:,0], kind='stable')]
+
+        header_str = catalog_header(yyyy_mm, BB, month, types_str)
+        write_catalog(ofn, header_str, js, types_str, fmt, append)
+        # this function is using numpy's savetxt 
+        # if this gets too unwieldly as text, we can try writing netcdf files 
+        # (since we already have netCDF4 imported) or
+        # output as matlab data with more investigation
+        print(f"Done.")
+        return ofn
+
+def catalog_header(yyyy_mm, BB, month, types_str):
+    """Header of the text catalog of jets within BB for the month"""
     # want to add a header for file
     desc_str = 'Date       Time     Level Latitude Longitude Altitude Windspeed UWind VWind GeopHeight'
     unit_str = 'YYYY MM DD hh mm ss hPa   deg      deg       km       m/sec     m/sec m/sec m'
     line_str = ('='*len(desc_str))
     
-    header_str = f"""# FileDescription: 'Jet Stream Positions'
+    return f"""# FileDescription: 'Jet Stream Positions'
 # YYYY_MM: {yyyy_mm}
 # LatExtents: {BB['lat'][0]} to {BB['lat'][1]} (deg)
 # LonExtents: {BB['lon'][0]} to {BB['lon'][1]} (deg)
 # LvlExtents: {BB['lvl'][0]} to {BB['lvl'][1]} (hPa)
-# DateExtents: {BB['dt'][0]} to {BB['dt'][1]} 
-# TableColumnTypes: {types_str}
+# DateExtents: {month[0]} to {month[1]} 
+# TableColumnTypes: YYYY MM DD hh mm ss {types_str}
 # TableStart:
 # {desc_str}
 # {unit_str}
 # {line_str}
 """
-    
+
+def write_catalog(ofn, header_str, js, types_str, fmt='txt', append=False):
+    """Write (or append to) the catalog as text or binary (see do_jscat)"""
     # write out the data
-    fn = f"js_{yyyy_mm}.txt"
-    ofn = '/'.join([outdir, fn])
-    print(f"Writing jets to {ofn} ... ")
-    write_jet_data(ofn, header_str, js)
-    # this function is using numpy's savetxt 
-    # if this gets too unwieldly as text, we can try writing netcdf files 
-    # (since we already have netCDF4 imported) or
-    # output as matlab data with more investigation
+    if append:
+        print(f"Appending {len(js)} jets to {ofn} ... ")
+        append_jet_data(ofn, js, types_str)
+    elif fmt == 'npy':
+        print(f"Writing jets to {ofn} ... ")
+        write_jet_records(ofn, jet_records(js, types_str))
+    else:
+        print(f"Writing jets to {ofn} ... ")
+        write_jet_data(ofn, header_str, js)
+
+def do_jscat_regions(yyyy_mm, outdir, regions=None, read_workers=1, lm=None,
+                     cache=False, backend='skimage', check=None, fmt='txt'):
+    """Catalogue jets for one month in each of several regions
+
+    The data of the union of the regions is got and derived once, and
+    the jets of each region are found within a view of it (see
+    region_view), so adding regions only adds the cost of finding jets.
+    Each region is written to outdir/NAME/js_YYYY_MM.txt with its own
+    header.
+
+    Parameters
+    ----------
+    regions : dict
+       BB (lon, lat, lvl) by region name, default is REGIONS
+    others : as for do_jscat()
+
+    Returns
+    -------
+    ofns : dict
+       path of the catalog written by region name
+    """
+    if regions is None:
+        regions = REGIONS
+    month = find_months(yyyy_mm)
+    BBs = list(regions.values())
+    BB = dict(lon=lon_union([r['lon'] for r in BBs]),
+              lat=[min(r['lat'][0] for r in BBs), max(r['lat'][1] for r in BBs)],
+              lvl=[min(r['lvl'][0] for r in BBs), max(r['lvl'][1] for r in BBs)],
+              dt=month)
+    lm = dict(jet_params, **(lm or {}))
+
+    print(f"Getting data for {yyyy_mm} in {len(regions)} region(s) within "
+          f"lon {BB['lon'][0]} to {BB['lon'][1]}, lat {BB['lat'][0]} to {BB['lat'][1]} ... ")
+    d = get_data(dapdir, BB, read_workers, cache=cache)
+
+    ofns = dict()
+    for name, region in regions.items():
+        print(f"Finding jets in {name} ... ")
+        dr = region_view(d, region)
+        jsidx = find_all_jets(dr, lm, backend)
+        if check:
+            compare_jets(dr, lm, (backend, check))
+        js, types_str = jet_table(dr, jsidx)
+
+        regiondir = '/'.join([outdir, name])
+        if not os.path.exists(regiondir):
+            os.makedirs(regiondir)
+        ofns[name] = '/'.join([regiondir, f"js_{yyyy_mm}.{fmt}"])
+        header_str = catalog_header(yyyy_mm, region, month, types_str)
+        write_catalog(ofns[name], header_str, js, types_str, fmt)
     print(f"Done.")
+    return ofns
 
-def run_all(outdir):
-    """ runs do_jscat(yyyy_mm, outdir) for """
+def run_all(outdir, **kwargs):
+    """ runs do_jscat(yyyy_mm, outdir, **kwargs) for """
     # for now do 2017-2018]
     seq = list(range(2017,2019)) # [2017, 2018]
     years = ['%d' % s for s in seq]
@@ -161,32 +283,69 @@ def run_all(outdir):
         for month in months:
             yyyy_mm = f'{year}_{month}'
             print(f"----{yyyy_mm}-----")
-            do_jscat(yyyy_mm, outdir)
+            do_jscat(yyyy_mm, outdir, **kwargs)
     
     toc = time.perf_counter()
     print(f"Total Time: {toc - tic:0.4f} seconds")
 
 
 def main():
-    do_all = False
+    parser = argparse.ArgumentParser(description='Jetstream catalogue (jscat) tool')
+    parser.add_argument('yyyy_mm', nargs='?', help='year and month, default runs all (see run_all)')
+    parser.add_argument('outdir', nargs='?', help="output directory, default '.' or './data' for all")
+    parser.add_argument('--lon', nargs=2, type=float, metavar=('MIN', 'MAX'),
+                        help='lon range (deg), MIN > MAX crosses the dateline e.g. 150 -130')
+    parser.add_argument('--lat', nargs=2, type=float, metavar=('MIN', 'MAX'), help='lat range (deg)')
+    parser.add_argument('--tile-size', type=float, help='process lon range in tiles of this many deg')
+    parser.add_argument('--workers', type=int, default=1, help='number of tiles processed in parallel')
+    parser.add_argument('--read-workers', type=int, default=1, help='number of parallel requests reading each param')
+    parser.add_argument('--backend', default='skimage', choices=list(jet_backends.keys()),
+                        help='jet detection backend')
+    parser.add_argument('--check', choices=list(jet_backends.keys()),
+                        help='compare jets found by backend with those of this backend')
+    parser.add_argument('--format', default='txt', choices=['txt', 'npy'],
+                        help='catalog as text or binary (numpy records)')
+    parser.add_argument('--tail', action='store_true',
+                        help='append only time steps newer than those in the catalog')
+    parser.add_argument('--regions', nargs='+', choices=list(REGIONS.keys()),
+                        help='catalog these regions from one get of data, each in outdir/NAME')
+    args = parser.parse_args()
+
     # set input time string and output directory
-    if len(sys.argv)==3:
-        yyyy_mm = sys.argv[1]
-        outdir = sys.argv[2]
-    elif len(sys.argv)==2:
-        yyyy_mm = sys.argv[1]
-        outdir = '.'
-    else:
-        do_all = True
-        outdir = './data'
+    do_all = args.yyyy_mm is None
+    if do_all and args.regions:
+        parser.error('--regions needs yyyy_mm')
+    if args.regions:
+        # regions have their own lon and lat, and are got whole in one process
+        given = [opt for opt, value in [('--tail', args.tail), ('--tile-size', args.tile_size),
+                                        ('--workers', args.workers != 1),
+                                        ('--lon', args.lon), ('--lat', args.lat)] if value]
+        if given:
+            parser.error('--regions cannot be used with ' + ', '.join(given))
+    outdir = args.outdir
+    if outdir is None:
+        outdir = './data' if do_all else '.'
+
+    BB = None
+    if args.lon or args.lat:
+        BB = dict( lon=args.lon or [-140, -50],
+                   lat=args.lat or [   0,  80],
+                   lvl=[ 100, 500])
+    kwargs = dict(BB=BB, tile_size=args.tile_size, workers=args.workers,
+                  read_workers=args.read_workers, backend=args.backend, check=args.check,
+                  fmt=args.format, tail=args.tail)
 
     if not os.path.exists(outdir):
         os.makedirs(outdir)
         
-    if do_all:
-        run_all(outdir)
+    if args.regions:
+        regions = {name: REGIONS[name] for name in args.regions}
+        do_jscat_regions(args.yyyy_mm, outdir, regions, read_workers=args.read_workers,
+                         backend=args.backend, check=args.check, fmt=args.format)
+    elif do_all:
+        run_all(outdir, **kwargs)
     else:
-        do_jscat(yyyy_mm, outdir)
+        do_jscat(args.yyyy_mm, outdir, **kwargs)
     
 if __name__ == "__main__":
     main()
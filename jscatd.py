@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+# coding: utf-8
+r""" Jetstream catalogue service (jscatd) for running many jscat jobs
+
+Runs do_jscat() jobs in a bounded pool of long-lived worker processes.
+Each worker imports the toolkit once and keeps the source datasets
+open with their coordinates decoded (see get_data(cache=True)), so a
+job only pays for getting its subset and finding the jets.  They are
+opened again for a month the data does not yet cover to its end, to
+see its new time steps.
+
+Jobs are submitted and watched over a local HTTP API (JSON):
+
+   POST /jobs          submit a job, returns its id and status
+   GET  /jobs          list all jobs
+   GET  /jobs/<id>     status of one job, with path of the catalog when done
+   GET  /metrics       counts of jobs by status, queue length, run times
+
+A job is a month, and optionally the BB and find_jets() params, e.g.
+   {"yyyy_mm": "2018_01", "lon": [-140, -50], "lat": [0, 80],
+    "lvl": [100, 500], "lm": {"threshold_abs": 35.0}, "tile_size": 30,
+    "backend": "numba"}
+
+The job id is a hash of the job with its defaults filled in, so
+submitting the same job again returns the one queued, running or done
+("force": true reruns one done), and runs one that failed again.  A done job of a month the data did not cover to its end
+(e.g. the current month) is run again, to catalog the new time steps.
+Catalogs are written to results/<id>/js_YYYY_MM.txt.
+
+Usage:
+%run jscatd.py [--port 8750] [--results ./results] [--workers 2]
+
+From a notebook or scheduler
+In[]: import json, urllib.request
+In[]: job = json.dumps({'yyyy_mm': '2018_01'}).encode()
+In[]: urllib.request.urlopen('http://localhost:8750/jobs', job).read()
+
+or from a unix prompt
+$ curl -d '{"yyyy_mm": "2018_01"}' http://localhost:8750/jobs
+$ curl http://localhost:8750/metrics
+
+"""
+#
+import os
+import time
+import json
+import queue
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from jsutil import jet_params, jet_backends
+
+# bounds of a job that gives none of lon, lat and lvl (as do_jscat)
+default_BB = dict(lon=[-140, -50], lat=[0, 80], lvl=[100, 500])
+
+def warm_worker():
+    """Import the toolkit and its heavy dependencies once in each worker process"""
+    import jscat
+    import netCDF4
+    import metpy.calc
+    import skimage.feature
+    import cv2
+
+def run_job(job, outdir):
+    """Run one catalog job in a worker process
+
+    Returns
+    -------
+    ofn : str
+       path of the catalog written
+    data_end : str
+       last time of the data if it ends within the month, else None
+    """
+    import jscat
+    month = jscat.find_months(job['yyyy_mm'])
+    dt = jscat.available_times(jscat.dapdir, month, cache=True)
+    if not month_done(dt, month):
+        # the source may have new time steps since the worker opened it
+        jscat.close_datasets()
+        dt = jscat.available_times(jscat.dapdir, month, cache=True)
+    data_end = None if month_done(dt, month) else str(dt[-1]) if len(dt) else ''
+    BB = None
+    if 'lon' in job or 'lat' in job or 'lvl' in job:
+        BB = {k: job.get(k, default_BB[k]) for k in ['lon', 'lat', 'lvl']}
+    if not os.path.exists(outdir):
+        os.makedirs(outdir)
+    ofn = jscat.do_jscat(job['yyyy_mm'], outdir, BB=BB,
+                         tile_size=job.get('tile_size'),
+                         lm=job.get('lm'), cache=True,
+                         backend=job.get('backend', 'skimage'))
+    return ofn, data_end
+
+def month_done(dt, month):
+    """True if times dt of the data reach the end of month [start, end),
+    i.e. the step after the last one is in the next month"""
+    if len(dt) < 2:
+        return False
+    return dt[-1] + (dt[-1] - dt[-2]) >= month[1]
+
+def job_id(job):
+    """Hash of the job keys that change the catalog, with the defaults
+    of those not given, so a job is the same however it is written"""
+    def number(v):
+        # 40 and 40.0 are the same
+        return float(v) if isinstance(v, (int, float)) else v
+    spec = dict(yyyy_mm=job['yyyy_mm'],
+                lm={k: number(v) for k, v in dict(jet_params, **(job.get('lm') or {})).items()},
+                tile_size=number(job.get('tile_size')),
+                backend=job.get('backend', 'skimage'))
+    for k in ['lon', 'lat', 'lvl']:
+        spec[k] = [number(v) for v in job.get(k, default_BB[k])]
+    spec = json.dumps(spec, sort_keys=True)
+    return hashlib.sha1(spec.encode()).hexdigest()[:12]
+
+def find_month(yyyy_mm):
+    """Check a job month string is YYYY_MM"""
+    try:
+        return time.strptime(yyyy_mm, '%Y_%m')
+    except (TypeError, ValueError):
+        return None
+
+class JobQueue:
+    """Queue of catalog jobs run by a bounded pool of worker processes
+
+    Parameters
+    ----------
+    results : str
+       directory for the results of each job
+    workers : int
+       number of worker processes (and jobs running at once)
+    max_queued : int
+       jobs waiting beyond this are refused
+    """
+    def __init__(self, results='./results', workers=2, max_queued=100):
+        self.results = results
+        self.max_queued = max_queued
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.pending = queue.Queue()
+        self.started = time.time()
+        self.workers = workers
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=warm_worker)
+        # one dispatcher thread per worker process, so a job is running
+        # as soon as a dispatcher hands it to the pool
+        for i in range(workers):
+            threading.Thread(target=self.dispatch, daemon=True).start()
+
+    def submit(self, job):
+        """Queue a job unless the same job is already known
+
+        Returns
+        -------
+        status : dict of the job, or None if the queue is full
+
+        Raises ValueError for a job that is not valid, or forced while
+        the same job is queued or running
+        """
+        if not isinstance(job, dict) or find_month(job.get('yyyy_mm')) is None:
+            raise ValueError("job needs 'yyyy_mm' as YYYY_MM")
+        if job.get('backend', 'skimage') not in jet_backends:
+            raise ValueError("job 'backend' must be one of %s" % list(jet_backends.keys()))
+        try:
+            jid = job_id(job)
+        except (TypeError, ValueError):
+            raise ValueError("job 'lon', 'lat' and 'lvl' must be [min, max] and 'lm' a dict")
+        with self.lock:
+            known = self.jobs.get(jid)
+            if known and known['status'] in ['queued', 'running']:
+                if job.get('force'):
+                    # a rerun would write the same results/<id>/ at once
+                    raise ValueError(f"job {jid} is {known['status']}, force reruns only a done or failed job")
+                return known
+            # a done job of a month the data had not covered is stale
+            if known and known['status'] == 'done' and known['data_end'] is None \
+               and not job.get('force'):
+                return known
+            if self.pending.qsize() >= self.max_queued:
+                return None
+            self.jobs[jid] = dict(id=jid, job=job, status='queued',
+                                  submitted=time.time(), started=None,
+                                  finished=None, seconds=None,
+                                  result=None, data_end=None, error=None)
+            self.pending.put(jid)
+            return self.jobs[jid]
+
+    def dispatch(self):
+        """Hand queued jobs to the pool one at a time, for ever"""
+        while True:
+            jid = self.pending.get()
+            with self.lock:
+                status = self.jobs[jid]
+                status['status'] = 'running'
+                status['started'] = time.time()
+            outdir = '/'.join([self.results, jid])
+            pool = self.pool
+            result, data_end = None, None
+            try:
+                result, data_end = pool.submit(run_job, status['job'], outdir).result()
+                error = None
+            except BrokenProcessPool as e:
+                # a worker died (e.g. killed out of memory), so the pool
+                # takes no more jobs
+                error = repr(e)
+                self.restart_pool(pool)
+            except Exception as e:
+                error = repr(e)
+            with self.lock:
+                status['status'] = 'failed' if error else 'done'
+                status['result'] = result
+                status['data_end'] = data_end
+                status['error'] = error
+                status['finished'] = time.time()
+                status['seconds'] = status['finished'] - status['started']
+
+    def restart_pool(self, broken):
+        """Replace the broken pool by a new one, once for all dispatchers"""
+        with self.lock:
+            if self.pool is not broken:
+                return
+            print("Worker pool is broken, starting a new one ... ")
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_worker)
+        broken.shutdown(wait=False)
+
+    def metrics(self):
+        """Counts of jobs by status, queue length and run times"""
+        with self.lock:
+            jobs = list(self.jobs.values())
+        m = dict(uptime=time.time()-self.started, queued=self.pending.qsize())
+        for s in ['queued', 'running', 'done', 'failed']:
+            m[s] = sum(1 for j in jobs if j['status'] == s)
+        seconds = [j['seconds'] for j in jobs if j['status'] == 'done']
+        m['mean_seconds'] = sum(seconds)/len(seconds) if seconds else None
+        m['max_seconds'] = max(seconds) if seconds else None
+        return m
+
+class Handler(BaseHTTPRequestHandler):
+    """HTTP API to the JobQueue of the server"""
+
+    def reply(self, code, body):
+        data = json.dumps(body, indent=1).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        jobs = self.server.jobs
+        path = self.path.strip('/').split('/')
+        if path == ['metrics']:
+            self.reply(200, jobs.metrics())
+        elif path == ['jobs']:
+            with jobs.lock:
+                self.reply(200, list(jobs.jobs.values()))
+        elif len(path) == 2 and path[0] == 'jobs' and path[1] in jobs.jobs:
+            with jobs.lock:
+                self.reply(200, jobs.jobs[path[1]])
+        else:
+            self.reply(404, dict(error='not found'))
+
+    def do_POST(self):
+        if self.path.strip('/') != 'jobs':
+            self.reply(404, dict(error='not found'))
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            status = self.server.jobs.submit(json.loads(self.rfile.read(length)))
+        except ValueError as e:
+            self.reply(400, dict(error=str(e)))
+            return
+        if status is None:
+            self.reply(503, dict(error='queue is full'))
+        else:
+            self.reply(202, status)
+
+def main():
+    parser = argparse.ArgumentParser(description='Jetstream catalogue service (jscatd)')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on (local only by default)')
+    parser.add_argument('--port', type=int, default=8750, help='port to listen on')
+    parser.add_argument('--results', default='./results', help='directory for results of each job')
+    parser.add_argument('--workers', type=int, default=2, help='number of worker processes')
+    parser.add_argument('--max-queued', type=int, default=100, help='refuse jobs beyond this many waiting')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.jobs = JobQueue(args.results, args.workers, args.max_queued)
+    print(f"Serving jscat jobs on http://{args.host}:{args.port} ... ")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    server.jobs.pool.shutdown(cancel_futures=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+""" Jet stream detection compiled with Numba (jsnumba)
+
+Fused kernel for the 'numba' backend of find_jets() (see jsutil).  For
+each time and longitude the vertical section of wind speed is searched
+for local maxima, thresholded and limited to one peak per region in one
+pass, with the sections spread over parallel threads.
+
+The local maxima follow skimage.feature.peak_local_max() (maximum filter
+with nearest edge, peaks sorted by intensity, then spacing by
+min_distance).  The limitation keeps the max peak with uwnd > 0 in each
+8-connected region of wspd > peaks_inside_threshold, as the OpenCV
+contours do in the skimage backend.  OpenCV also traces the border of
+each hole of a region as a contour, so the skimage backend also keeps
+the max peak within each hole's contour, i.e. next to the hole, which
+this one does not.  Its jets are then those of skimage less such peaks
+(see tests/test_backends.py); jsutil.compare_jets() reports any
+difference.
+
+"""
+
+import numpy as np
+import numba
+
+@numba.njit(cache=True)
+def section_peaks(w, min_distance, threshold, border, num_peaks, peaks):
+    """Find local max of a section w(lvl,lat) like peak_local_max()
+
+    Fills peaks (num_peaks x 2) with [lvlidx, latidx] and returns the
+    number of peaks found.
+    """
+    ny, nx = w.shape
+    md = min_distance
+    iscand = np.zeros((ny, nx), dtype=np.bool_)
+    nequal = 0
+    ncand = 0
+    for i in range(ny):
+        for j in range(nx):
+            # maximum filter of size 2*md+1 with nearest edge mode
+            m = w[i, j]
+            for ii in range(max(0, i-md), min(ny, i+md+1)):
+                for jj in range(max(0, j-md), min(nx, j+md+1)):
+                    if w[ii, jj] > m:
+                        m = w[ii, jj]
+            if w[i, j] == m:
+                nequal += 1
+                if w[i, j] > threshold and i >= border and i < ny-border \
+                   and j >= border and j < nx-border:
+                    iscand[i, j] = True
+                    ncand += 1
+    # no peak for a trivial image, unless each pixel is its own
+    # neighbourhood (min_distance 0), as peak_local_max()
+    if (md > 0 and nequal == ny*nx) or ncand == 0:
+        return 0
+
+    # candidates in row-major order, then highest peak first
+    cy = np.empty(ncand, dtype=np.int64)
+    cx = np.empty(ncand, dtype=np.int64)
+    cval = np.empty(ncand)
+    n = 0
+    for i in range(ny):
+        for j in range(nx):
+            if iscand[i, j]:
+                cy[n] = i
+                cx[n] = j
+                cval[n] = -w[i, j]
+                n += 1
+    order = np.argsort(cval, kind='mergesort')
+
+    # keep peaks at least min_distance apart, highest first
+    rejected = np.zeros(ncand, dtype=np.bool_)
+    npeaks = 0
+    for a in range(ncand):
+        if npeaks >= num_peaks:
+            break
+        ka = order[a]
+        if rejected[ka]:
+            continue
+        peaks[npeaks, 0] = cy[ka]
+        peaks[npeaks, 1] = cx[ka]
+        npeaks += 1
+        if md > 1:
+            for b in range(a+1, ncand):
+                kb = order[b]
+                if max(abs(cy[kb]-cy[ka]), abs(cx[kb]-cx[ka])) < md:
+                    rejected[kb] = True
+    return npeaks
+
+@numba.njit(cache=True)
+def limit_peaks(w, u, peaks, npeaks, threshold, keep):
+    """Keep the max peak with u > 0 in each region of w > threshold
+
+    Regions are 8-connected pixels of w(lvl,lat) > threshold, found by
+    flood fill from each peak.  Sets keep[:npeaks].
+    """
+    ny, nx = w.shape
+    label = np.zeros((ny, nx), dtype=np.int64)
+    stack = np.empty((ny*nx, 2), dtype=np.int64)
+    region = np.zeros(npeaks, dtype=np.int64)
+    nlabel = 0
+    for ip in range(npeaks):
+        keep[ip] = False
+        y, x = peaks[ip, 0], peaks[ip, 1]
+        if not w[y, x] > threshold:
+            continue
+        if label[y, x] == 0:
+            # flood fill new region
+            nlabel += 1
+            label[y, x] = nlabel
+            stack[0, 0] = y
+            stack[0, 1] = x
+            top = 1
+            while top > 0:
+                top -= 1
+                sy, sx = stack[top, 0], stack[top, 1]
+                for ii in range(max(0, sy-1), min(ny, sy+2)):
+                    for jj in range(max(0, sx-1), min(nx, sx+2)):
+                        if label[ii, jj] == 0 and w[ii, jj] > threshold:
+                            label[ii, jj] = nlabel
+                            stack[top, 0] = ii
+                            stack[top, 1] = jj
+                            top += 1
+        region[ip] = label[y, x]
+
+    for ip in range(npeaks):
+        if region[ip] == 0:
+            continue
+        # max of peaks in this region
+        m = -np.inf
+        for jp in range(npeaks):
+            if region[jp] == region[ip]:
+                m = max(m, w[peaks[jp, 0], peaks[jp, 1]])
+        # any peak with this max and eastward wind is kept
+        for jp in range(npeaks):
+            if w[peaks[jp, 0], peaks[jp, 1]] == m and u[peaks[jp, 0], peaks[jp, 1]] > 0:
+                keep[jp] = True
+
+@numba.njit(parallel=True, cache=True)
+def jets_kernel(wspd, uwnd, dtidxs, min_distance, threshold, border, num_peaks,
+                toggle, inside_threshold, peaks, counts):
+    """Find jets for each time in dtidxs and each longitude in parallel
+
+    wspd and uwnd are (dt,lvl,lat,lon).  For section k = i*nlon + lonidx
+    of time dtidxs[i], fills peaks[k] with [lvlidx, latidx] of the
+    peaks kept, in order, and counts[k] with how many.
+    """
+    nlon = wspd.shape[3]
+    for k in numba.prange(len(dtidxs)*nlon):
+        dtidx = dtidxs[k // nlon]
+        lonidx = k % nlon
+        w = wspd[dtidx, :, :, lonidx]
+        found = np.empty((num_peaks, 2), dtype=np.int64)
+        npeaks = section_peaks(w, min_distance, threshold, border, num_peaks, found)
+        keep = np.ones(npeaks, dtype=np.bool_)
+        if toggle:
+            limit_peaks(w, uwnd[dtidx, :, :, lonidx], found, npeaks, inside_threshold, keep)
+        n = 0
+        for ip in range(npeaks):
+            if keep[ip]:
+                peaks[k, n, 0] = found[ip, 0]
+                peaks[k, n, 1] = found[ip, 1]
+                n += 1
+        counts[k] = n
+
+def find_jets(wspd, uwnd, dtidxs, p):
+    """Find jets with the compiled kernel
+
+    Parameters
+    ----------
+    wspd, uwnd : ndarrays (dt,lvl,lat,lon) without units
+    dtidxs : list of int
+       indices of date and time to search
+    p : dict of parameters (see jsutil.find_jets)
+
+    Returns
+    -------
+    jsidx : numpy array of integers nx4
+       columns as [dtidx, zidx, latidx, lonidx] for each peak found
+    """
+    dtidxs = np.asarray(dtidxs, dtype=np.int64)
+    nlon = wspd.shape[3]
+    num_peaks = int(p['num_peaks'])
+    peaks = np.zeros((len(dtidxs)*nlon, num_peaks, 2), dtype=np.int64)
+    counts = np.zeros(len(dtidxs)*nlon, dtype=np.int64)
+    # exclude_border True means min_distance, as in peak_local_max()
+    border = p['exclude_border']
+    if border is True:
+        border = p['min_distance']
+    jets_kernel(np.asarray(wspd, dtype=np.float64), np.asarray(uwnd, dtype=np.float64),
+                dtidxs, int(p['min_distance']), float(p['threshold_abs']), int(border),
+                num_peaks, bool(p['peaks_inside_toggle']), float(p['peaks_inside_threshold']),
+                peaks, counts)
+
+    # sections in order of time then lon, peaks in order kept
+    k = np.repeat(np.arange(len(counts)), counts)
+    n = np.arange(len(k)) - np.repeat(np.cumsum(counts) - counts, counts)
+    jsidx = np.empty((len(k), 4), dtype=int)
+    jsidx[:,0] = dtidxs[k // nlon]
+    jsidx[:,1] = peaks[k, n, 0]
+    jsidx[:,2] = peaks[k, n, 1]
+    jsidx[:,3] = k % nlon
+    return jsidx
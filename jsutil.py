@@ -7,16 +7,18 @@ import os
 import re
 import time
 import datetime
-
-import netCDF4
+import shutil
+import tempfile
+import itertools
+import contextlib
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
-import metpy
-import metpy.calc
-from metpy.units import units
 
-from skimage.feature import peak_local_max
-import cv2
+# netCDF4, metpy, skimage and cv2 are slow to import, so each is
+# imported within the functions that use them, on first call
 
 def scanf_datetime(ts, fmt='%Y-%m-%dT%H:%M:%S'):
     """Convert string representing date and time to datetime object"""
@@ -68,7 +70,288 @@ def find_months(year, month=1):
     # return (prev_month, this_month, next_month)
     return [this_month, next_month]
 
-def find_jets(d, dtidx=0, p={}):
+def shift_month(yyyy_mm, n=1):
+    """Year and month n months before (n<0) or after yyyy_mm
+
+    Examples
+    --------
+    >>> shift_month('2018_12')
+    '2019_01'
+    >>> shift_month('2018_01', -1)
+    '2017_12'
+    """
+    dt = scanf_datetime(yyyy_mm, fmt='%Y_%m')
+    m = dt.year*12 + dt.month-1 + n
+    return '%04d_%02d' % (m // 12, m % 12 + 1)
+
+def lon_span(lon_range):
+    """Eastward extent in degrees of a longitude range
+
+    A range whose first value is east of the second (e.g. [150, -130])
+    wraps across the dateline.  A range of 360 degrees or more
+    (e.g. [-180, 180] or [0, 360]) is the whole globe.
+
+    Examples
+    --------
+    >>> lon_span([-140, -50])
+    90.0
+    >>> lon_span([150, -130])
+    80.0
+    >>> lon_span([-180, 180])
+    360.0
+    """
+    lo, hi = lon_range
+    if hi - lo >= 360.:
+        return 360.
+    return float((hi - lo) % 360.)
+
+def lon_index(lon, lon_range, closed=True):
+    """Find indices of lon within lon_range, handling the 0/360 or +/-180 wrap
+
+    Parameters
+    ----------
+    lon : ndarray
+       longitudes of the source grid in any convention (0 to 360 or -180 to 180)
+    lon_range : list [min, max]
+       range in any convention, ordered eastward from min to max
+    closed : bool
+       include lon_range[1] in the range, otherwise the range is half-open.
+       A whole globe range is always half-open so no longitude repeats.
+
+    Returns
+    -------
+    lonidx : numpy array of integers
+       indices into lon ordered eastward from lon_range[0], so a range
+       across the dateline is returned as one continuous run of longitudes
+    """
+    span = lon_span(lon_range)
+    # degrees east of the start of the range for each lon
+    offset = (np.asarray(lon) - lon_range[0]) % 360.
+    if span >= 360. or not closed:
+        (lonidx,) = (offset < span).nonzero()
+    else:
+        (lonidx,) = (offset <= span).nonzero()
+    return lonidx[np.argsort(offset[lonidx], kind='stable')]
+
+def lon_tiles(lon_range, tile_size):
+    """Split a longitude range into tiles of tile_size degrees
+
+    Each tile is half-open except the last one of a range that is not the
+    whole globe, so that no longitude is catalogued by two tiles.
+
+    Returns
+    -------
+    tiles : list of dict
+       each as dict(lon=[min, max], closed=bool), ready to be used with
+       lon_index() or to update a BB
+    """
+    span = lon_span(lon_range)
+    ntiles = max(1, int(np.ceil(span/tile_size)))
+    tiles = []
+    for i in range(ntiles):
+        lo = lon_range[0] + i*tile_size
+        hi = min(lo + tile_size, lon_range[0] + span)
+        # keep the values in the convention used by lon_range
+        if lo >= 180. and max(lon_range) <= 180.:
+            lo, hi = lo - 360., hi - 360.
+        closed = (i == ntiles-1) and (span < 360.)
+        tiles.append(dict(lon=[lo, hi], closed=closed))
+    return tiles
+
+def lon_union(lon_ranges):
+    """Smallest longitude range that covers all of lon_ranges
+
+    Each range may cross the dateline.  The union starts at the start of
+    one of the ranges, so it is in the convention of that range.
+
+    Examples
+    --------
+    >>> lon_union([[-140, -50], [-80, 0]])
+    [-140, 0.0]
+    >>> lon_union([[-140, -50], [140, -120]])
+    [140, -50.0]
+    """
+    best = None
+    for start in [r[0] for r in lon_ranges]:
+        # eastward extent from start needed to reach the end of every range
+        span = max((r[0] - start) % 360. + lon_span(r) for r in lon_ranges)
+        if best is None or span < best[1]:
+            best = (start, span)
+    start, span = best
+    if span >= 360.:
+        return [start, start + 360.]
+    end = start + span
+    # keep the end in the convention of the ranges
+    if end > 360. or (end > 180. and min(min(r) for r in lon_ranges) < 0.):
+        end -= 360.
+    return [start, end]
+
+def index_slices(idx):
+    """Group an index array into hyperslabs (slices of constant stride)
+
+    Parameters
+    ----------
+    idx : array of integers
+       indices along one dimension in the order they are wanted
+
+    Returns
+    -------
+    slices : list of slice
+       slices that together select idx in order, e.g. indices of a
+       lon range across the dateline give two slices
+
+    Examples
+    --------
+    >>> index_slices([4, 5, 6, 7])
+    [slice(4, 8, 1)]
+    >>> index_slices([140, 142, 144, 0, 2])
+    [slice(140, 145, 2), slice(0, 3, 2)]
+    """
+    idx = [int(i) for i in idx]
+    slices = []
+    i = 0
+    while i < len(idx):
+        j = i
+        step = 1
+        if i+1 < len(idx) and idx[i+1] > idx[i]:
+            step = idx[i+1] - idx[i]
+            j = i+1
+            while j+1 < len(idx) and idx[j+1] - idx[j] == step:
+                j += 1
+        slices.append(slice(idx[i], idx[j]+1, step))
+        i = j+1
+    return slices
+
+def split_slice(s, size):
+    """Split slice s so no part crosses a multiple of size
+
+    With size a multiple of the chunk length along the dimension, each part
+    starts and ends on whole chunks of the source (except at the ends of s).
+    """
+    parts = []
+    start = s.start
+    while start < s.stop:
+        stop = min(s.stop, (start//size + 1)*size)
+        parts.append(slice(start, stop, s.step))
+        # next index on the stride at or after stop
+        start += -(-(stop-start)//s.step)*s.step
+    return parts
+
+def _read_slab(var, slab, remote=True):
+    """Read one hyperslab of var as ndarray
+
+    A strided slab is done by the server for a remote (OPeNDAP) source,
+    but the netCDF library is slow with strides on local files, so there
+    the contiguous slab is read and strided in memory.
+    """
+    if remote or all(s.step == 1 for s in slab):
+        return np.ma.getdata(var[slab])
+    block = np.ma.getdata(var[tuple(slice(s.start, s.stop) for s in slab)])
+    return block[tuple(slice(None, None, s.step) for s in slab)]
+
+def _read_slabs(ifn, varname, slabs):
+    """Read each hyperslab of varname (worker for read_subset)"""
+    import netCDF4
+    nc = netCDF4.Dataset(ifn)
+    remote = ifn.startswith('http')
+    blocks = [_read_slab(nc.variables[varname], slab, remote) for slab in slabs]
+    nc.close()
+    return blocks
+
+def read_subset(nc, varname, idx, workers=1, max_request_bytes=2**26):
+    """Read the subset of a variable selected by index arrays as hyperslabs
+
+    The indices along each dimension are turned into start/stop/stride
+    slices (see index_slices), and the first (time) dimension is further
+    split into requests of at most max_request_bytes, aligned to the
+    chunking of the source, that can be fetched by parallel workers.
+
+    Parameters
+    ----------
+    nc : netCDF4.Dataset
+       open dataset (a local file or OPeNDAP url)
+    varname : str
+       name of the variable in nc
+    idx : list of index arrays, one per dimension of the variable
+    workers : int
+       number of processes to fetch the requests, each with its own
+       connection to nc.filepath(), started by a forkserver where there
+       is one
+    max_request_bytes : int
+       largest size of one request as stored in the source
+
+    Returns
+    -------
+    data : ndarray with shape of lengths of idx
+    stats : dict
+       requests, bytes read (as stored, e.g. packed short, and the whole
+       block of a strided slab of a local file, see _read_slab) and
+       seconds to read
+    """
+    tic = time.perf_counter()
+    var = nc.variables[varname]
+    shape = [len(i) for i in idx]
+    stats = dict(requests=0, bytes=0, seconds=0.)
+    if 0 in shape:
+        return np.empty(shape, dtype=var.dtype), stats
+
+    slabs = [index_slices(i) for i in idx]
+    # size of time steps per request, in whole chunks along time
+    chunking = var.chunking()
+    tchunk = chunking[0] if isinstance(chunking, list) else 1
+    step_bytes = var.dtype.itemsize * int(np.prod(shape[1:]))
+    nsteps = max(1, max_request_bytes // step_bytes // tchunk) * tchunk
+    slabs[0] = [part for s in slabs[0] for part in split_slice(s, nsteps)]
+    requests = list(itertools.product(*slabs))
+
+    remote = nc.filepath().startswith('http')
+    if workers > 1 and len(requests) > 1:
+        # each worker reads every n-th request and blocks are put back in order
+        groups = [requests[i::workers] for i in range(workers)]
+        # workers are not forked from this process, which may have started
+        # the threads of the numba backend (forking after them hangs at exit)
+        methods = multiprocessing.get_all_start_methods()
+        ctx = multiprocessing.get_context('forkserver' if 'forkserver' in methods else None)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            results = list(pool.map(_read_slabs, itertools.repeat(nc.filepath()),
+                                    itertools.repeat(varname), groups))
+        blocks = [None]*len(requests)
+        for i, group_blocks in enumerate(results):
+            blocks[i::workers] = group_blocks
+    else:
+        blocks = [_read_slab(var, slab, remote) for slab in requests]
+
+    # nest blocks by dimension so np.block() puts them together in order
+    def nest(blocks, counts):
+        if len(counts) == 1:
+            return list(blocks)
+        n = len(blocks)//counts[0]
+        return [nest(blocks[i*n:(i+1)*n], counts[1:]) for i in range(counts[0])]
+    if len(blocks) == 1:
+        data = blocks[0]
+    else:
+        data = np.block(nest(blocks, [len(s) for s in slabs]))
+
+    stats['requests'] = len(requests)
+    def slab_size(slab):
+        if remote or all(s.step == 1 for s in slab):
+            return int(np.prod([len(range(s.start, s.stop, s.step)) for s in slab]))
+        return int(np.prod([s.stop - s.start for s in slab]))
+    stats['bytes'] = sum(slab_size(slab) for slab in requests) * var.dtype.itemsize
+    stats['seconds'] = time.perf_counter() - tic
+    return data, stats
+
+# default parameters of find_jets()
+jet_params = { 'num_peaks' : 4,
+               'min_distance' : 3,
+               'exclude_border' : 0,
+               'threshold_abs': 40.,
+               #
+               'peaks_inside_toggle': 1,
+               'peaks_inside_threshold': 30.,
+               'peaks_inside_zonal_max': 0}
+
+def find_jets(d, dtidx=0, p={}, backend='skimage'):
     """
     Find lat and z of local max winds for each longitude
     at one date/time (dtidx).
@@ -80,30 +363,75 @@ def find_jets(d, dtidx=0, p={}):
     dtidx : int
       index of date and time 
     p : dict of parameters used by peak_local_max()
+    backend : str
+      name of detection backend in jet_backends
    
     Returns
     -------
     jsidx : numpy array of integers nx4
        columns as [dtidx, zidx, latidx, lonidx] for each peak found
     """
+    return find_all_jets(d, p, backend, dtidxs=[dtidx])
+
+def find_all_jets(d, p={}, backend='skimage', dtidxs=None):
+    """
+    Find jets at each date/time (or those in dtidxs) with a backend
 
+    Backends are functions in jet_backends, called as fn(d, dtidxs, p).
+    'skimage' is the reference using skimage and OpenCV, one section at
+    a time.  'numba' is a compiled kernel that does the same in one pass
+    over time and longitude in parallel (see jsnumba).
+
+    Returns
+    -------
+    jsidx : numpy array of integers nx4
+       columns as [dtidx, zidx, latidx, lonidx], in order of dtidx then lonidx
+    """
     # p is empty, set some defaults
     if not bool(p):
-        p = { 'num_peaks' : 4,
-              'min_distance' : 3,
-              'exclude_border' : 0,
-              'threshold_abs': 40.,
-              #
-              'peaks_inside_toggle': 1,
-              'peaks_inside_threshold': 30.,
-              'peaks_inside_zonal_max': 0}
+        p = jet_params
+    if dtidxs is None:
+        dtidxs = range(len(d['dt']))
+    if backend not in jet_backends:
+        raise ValueError("backend must be one of %s" % list(jet_backends.keys()))
+    return jet_backends[backend](d, dtidxs, p)
+
+def _jets_numba(d, dtidxs, p):
+    """ 'numba' backend, fused and compiled kernel """
+    try:
+        import jsnumba
+    except ImportError:
+        raise ImportError("the 'numba' backend of find_jets() requires numba")
+    # wind of only the times from first to last of dtidxs
+    dtidxs = list(dtidxs)
+    if not dtidxs:
+        return np.empty((0,4), dtype=int)
+    first, last = min(dtidxs), max(dtidxs)
+    span = dict(dt=slice(first, last+1))
+    jsidx = jsnumba.find_jets(d.take('wspd', **span).m, d.take('uwnd', **span).m,
+                              [dtidx - first for dtidx in dtidxs], p)
+    jsidx[:,0] += first
+    return jsidx
+
+def _jets_skimage(d, dtidxs, p):
+    """ 'skimage' backend, reference using peak_local_max and OpenCV contours """
+    jsidx = [_find_jets_skimage(d, dtidx, p) for dtidx in dtidxs]
+    return np.vstack([np.empty((0,4), dtype=int)] + jsidx)
+
+def _find_jets_skimage(d, dtidx, p):
+    """ find jets at one date/time (dtidx) for the 'skimage' backend """
+    from skimage.feature import peak_local_max
+    import cv2
 
     lons = list(range(0,d['lon'].size))
     jsidx = []
+    # wind at this time only -- wspd(lvl,lat,lon)
+    wspd_dt = d.take('wspd', dt=dtidx)
+    uwnd_dt = d.take('uwnd', dt=dtidx)
 
     for lonidx in lons:
       # vertical section at each lonidx of wind speed -- wspd(lvl,lat)
-      wsec = d['wspd'][dtidx,:,:,lonidx].squeeze()
+      wsec = wspd_dt[:,:,lonidx].squeeze()
 
       # find lvl and lat where peak winds speeds exceed 30 m/sec and not on border of domain
       # recall wsec.m is metpy array without units
@@ -120,13 +448,13 @@ def find_jets(d, dtidx=0, p={}):
           # get wind speeds (wspd and uwnd) at peaks
           # bool to track of which peaks to keep 
           keep = np.full(numpeaks, False)
-          wspd = np.full(numpeaks, np.NaN)
-          uwnd = np.full(numpeaks, np.NaN)
+          wspd = np.full(numpeaks, np.nan)
+          uwnd = np.full(numpeaks, np.nan)
           # get wind speeds and uwnd for each peak
           for i, peak in enumerate(yx):
               lvlidx, latidx = peak # since wsec(lvl,lat)
-              uwnd[i] = d['uwnd'][dtidx,lvlidx,latidx,lonidx].m
-              wspd[i] = d['wspd'][dtidx,lvlidx,latidx,lonidx].m
+              uwnd[i] = uwnd_dt[lvlidx,latidx,lonidx].m
+              wspd[i] = wspd_dt[lvlidx,latidx,lonidx].m
 
           # Find contours of 30 m/s
           # Apply thresholding to the surface and cast as uint8
@@ -150,7 +478,7 @@ def find_jets(d, dtidx=0, p={}):
               # bool to track which peaks inside contour
               inside = np.full(numpeaks, False)
               for ip, peak in enumerate(yx):
-                  pt = tuple(yx[ip,:])
+                  pt = (float(yx[ip,0]), float(yx[ip,1]))
                   try:
                       inside[ip] = (cv2.pointPolygonTest(contour,pt,False) >= 0)
                   except:
@@ -173,9 +501,303 @@ def find_jets(d, dtidx=0, p={}):
           jsidx.append([dtidx,lvlidx,latidx,lonidx])
 
     # end for each lon
-    return np.array(jsidx, dtype=int)
+    # keep nx4 shape when no peaks found (e.g. a tile with no jets)
+    return np.array(jsidx, dtype=int).reshape(-1, 4)
+
+# quantities derived from the data of get_data(), computed on first use
+# (see LazyData).  Each function takes its deps and returns the quantity
+# with all four dimensions (dt, level, lat, lon), of length 1 for those
+# it does not have, so it works on any slice of them.
+DIMS = ('dt', 'level', 'lat', 'lon')
+
+def _wspd(uwnd, vwnd):
+    import metpy.calc
+    return metpy.calc.wind_speed(uwnd, vwnd)
+
+def _hgt(geopot):
+    import metpy.calc
+    return metpy.calc.geopotential_to_height(geopot)
+
+def _ht_std(level, level_units):
+    import metpy.calc
+    from metpy.units import units
+    return metpy.calc.pressure_to_height_std(level * units(level_units))
+
+def _pdiff(msl):
+    # difference of msl from std pressure (1013.25 * units.hPa) at sea level
+    from metpy.units import units
+    return msl - 1013.25 * units.hPa
+
+def _alt(ht_std, pdiff):
+    import metpy.calc
+    return metpy.calc.add_pressure_to_height(ht_std, pdiff)
+
+def _shear(uwnd, vwnd, hgt):
+    # centered differences between levels, one-sided at the top and bottom
+    dz = np.gradient(hgt, axis=1)
+    dudz = np.gradient(uwnd, axis=1) / dz
+    dvdz = np.gradient(vwnd, axis=1) / dz
+    return np.sqrt(dudz**2 + dvdz**2).to('1/s')
+
+def _uzonal(uwnd):
+    return np.mean(uwnd, axis=3, keepdims=True)
+
+# dimensions of the data got by get_data()
+FIELD_DIMS = {'dt': ('dt',), 'level': ('level',), 'lat': ('lat',), 'lon': ('lon',),
+              'geopot': DIMS, 'uwnd': DIMS, 'vwnd': DIMS, 'msl': ('dt', 'lat', 'lon')}
+
+# derived quantities by name: deps, dims of the quantity and func.
+# along are the dims it can be computed on a slice of (default all dims),
+# others need all values of the deps, e.g. for a derivative or mean.
+DERIVED = {
+    'wspd':   dict(deps=['uwnd', 'vwnd'], dims=DIMS, func=_wspd),
+    'hgt':    dict(deps=['geopot'], dims=DIMS, func=_hgt),
+    'ht_std': dict(deps=['level', 'level_units'], dims=('level',), func=_ht_std),
+    'pdiff':  dict(deps=['msl'], dims=('dt', 'lat', 'lon'), func=_pdiff),
+    'alt':    dict(deps=['ht_std', 'pdiff'], dims=DIMS, func=_alt),
+    'shear':  dict(deps=['uwnd', 'vwnd', 'hgt'], dims=DIMS, func=_shear,
+                   along=('dt', 'lat', 'lon')),
+    'uzonal': dict(deps=['uwnd'], dims=('dt', 'level', 'lat'), func=_uzonal),
+    }
+
+def data_dims(name):
+    """Dimensions of data or derived quantity name, () if it has none"""
+    if name in DERIVED:
+        return DERIVED[name]['dims']
+    return FIELD_DIMS.get(name, ())
+
+def _pointwise(name):
+    """True if each value of derived quantity name depends only on values
+    of its deps at the same point, so it can be computed anywhere"""
+    spec = DERIVED[name]
+    dims = spec['dims']
+    return spec.get('along', dims) == dims and all(
+        all(dim in dims for dim in data_dims(dep)) and (dep not in DERIVED or _pointwise(dep))
+        for dep in spec['deps'])
+
+def _take(a, dims, index):
+    """Index a with index (int, slice or array by dimension name) along dims"""
+    if not index or not dims:
+        return a
+    return a[tuple(index.get(dim, slice(None)) for dim in dims)]
+
+def _nbytes(a):
+    return np.asarray(getattr(a, 'magnitude', a)).nbytes
+
+class LazyData(dict):
+    """Dict of data from get_data() whose derived quantities (see DERIVED)
+    are computed on first use and remembered
+
+    d['wspd'] is computed for the whole array; d.take('wspd', dt=0) for
+    only that part.  Remembered quantities beyond budget bytes are
+    forgotten, least recently used first, to be computed again if
+    needed.  The data itself is never forgotten.
+
+    Parameters
+    ----------
+    budget : int
+       bytes of derived quantities to remember, default no limit
+    parent : LazyData
+       if given, derived quantities are taken from parent at view (see
+       region_view), from its parts of whole time steps, so views that
+       overlap share them and each is computed once for all views.
+       Those that need all values along a dim (e.g. uzonal, shear) are
+       computed from the data of the view, as for data got within it.
+    view : dict
+       slice by dimension name of parent
+    """
+    def __init__(self, *args, budget=None, parent=None, view=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.budget = budget
+        self.parent = parent
+        self.view = view or {}
+        # bytes remembered by key (name or part), least recently used first
+        self.memo = OrderedDict()
+        self.parts = {}
+        self.nbytes = 0
+
+    def __getitem__(self, name):
+        if name in self.memo:
+            self.memo.move_to_end(name)
+        return super().__getitem__(name)
 
-def get_data(indir, BB):
+    def __missing__(self, name):
+        if name not in DERIVED:
+            raise KeyError(name)
+        if self.parent is not None and _pointwise(name):
+            # a view of the whole of parent, shared by all views
+            value = _take(self.parent[name], data_dims(name), self.view)
+            self._remember(name, value)
+            return value
+        value = self._derive(name, {})
+        self._remember(name, value)
+        return value
+
+    def take(self, name, **index):
+        """Part of name at index (int, slice or array) by dimension name
+
+        e.g. d.take('wspd', dt=0, lon=slice(10, 20)) is d['wspd'][0,:,:,10:20]
+        computed for that part only.  Arrays for every dimension take
+        values at points, e.g. of jets.
+        """
+        dims = data_dims(name)
+        index = {dim: i for dim, i in index.items() if dim in dims and not
+                 (isinstance(i, slice) and i.indices(len(self[dim])) == (0, len(self[dim]), 1))}
+        # negative ints from the end, as in indexing
+        index = {dim: i % len(self[dim]) if isinstance(i, (int, np.integer)) else i
+                 for dim, i in index.items()}
+        if name not in DERIVED or name in self or not index:
+            return _take(self[name], dims, index)
+        if self.parent is not None and _pointwise(name):
+            mapped = self._parent_index(dims, index)
+            if mapped is None:
+                return _take(self[name], dims, index)
+            if any(not isinstance(i, (slice, int, np.integer)) for i in index.values()):
+                # at points, computed for only those
+                return self.parent.take(name, **mapped)
+            # the part of parent of the time steps, whole in other dims,
+            # so views that overlap share it
+            at = {dim: mapped.pop(dim) for dim in ['dt'] if dim in mapped}
+            part_dims = tuple(dim for dim in dims if not isinstance(at.get(dim), (int, np.integer)))
+            return _take(self.parent.take(name, **at), part_dims, mapped)
+        if any(not isinstance(i, (slice, int, np.integer)) for i in index.values()):
+            # at points, only of quantities computed point by point
+            if not _pointwise(name):
+                return _take(self[name], dims, index)
+            deps = [self.take(dep, **index) for dep in DERIVED[name]['deps']]
+            return DERIVED[name]['func'](*deps)
+        # ints as slices of one, taken out after
+        ints = {dim: 0 for dim, i in index.items() if not isinstance(i, slice)}
+        index = {dim: i if isinstance(i, slice) else slice(i, i+1) for dim, i in index.items()}
+        key = (name,) + tuple((dim, s.start, s.stop, s.step) for dim, s in sorted(index.items()))
+        # a part remembered of the same slices of some dims holds this one,
+        # e.g. the section at one lon of the time shown
+        for part in self.parts:
+            if part[0] == name and all(index.get(dim) == slice(*s) for dim, *s in part[1:]):
+                self.memo.move_to_end(part)
+                sliced = [dim for dim, *s in part[1:]]
+                rest = {dim: i for dim, i in index.items() if dim not in sliced}
+                return _take(_take(self.parts[part], dims, rest), dims, ints)
+        value = self._derive(name, index)
+        self._remember(key, value)
+        return _take(value, dims, ints)
+
+    def _parent_index(self, dims, index):
+        """index of the view as index of parent, or None if the view is
+        not a slice of parent (see region_view)"""
+        mapped = {}
+        for dim in dims:
+            v = self.view.get(dim)
+            i = index.get(dim)
+            if v is None:
+                if i is not None:
+                    mapped[dim] = i
+            elif not isinstance(v, slice):
+                return None
+            elif i is None:
+                mapped[dim] = v
+            elif isinstance(i, slice):
+                start, stop, step = i.indices(v.stop - v.start)
+                if step < 0:
+                    return None
+                mapped[dim] = slice(v.start + start, v.start + stop, step)
+            elif isinstance(i, (int, np.integer)):
+                mapped[dim] = v.start + i % (v.stop - v.start)
+            else:
+                mapped[dim] = v.start + np.asarray(i)
+        return mapped
+
+    def _derive(self, name, index):
+        """Compute name from its deps at index (slices) by dimension name"""
+        spec = DERIVED[name]
+        dims = spec['dims']
+        along = spec.get('along', dims)
+        deps = []
+        for dep in spec['deps']:
+            dep_dims = data_dims(dep)
+            if index:
+                a = self.take(dep, **{dim: index[dim] for dim in along if dim in index})
+            else:
+                a = self[dep]
+            if dep_dims:
+                # with length 1 for the dims it does not have
+                a = a.reshape([a.shape[dep_dims.index(dim)] if dim in dep_dims else 1
+                               for dim in DIMS])
+            deps.append(a)
+        value = spec['func'](*deps)
+        value = value.reshape([value.shape[DIMS.index(dim)] for dim in dims])
+        # dims that need all values are sliced after
+        return _take(value, dims, {dim: i for dim, i in index.items() if dim not in along})
+
+    def _remember(self, key, value):
+        """Keep value of key (name or part), forgetting others beyond budget"""
+        nbytes = _nbytes(value)
+        if self.budget is not None and nbytes > self.budget:
+            return
+        if isinstance(key, str):
+            # parts of the whole are not needed
+            for part in [k for k in self.parts if k[0] == key]:
+                self._forget(part)
+            dict.__setitem__(self, key, value)
+        else:
+            self.parts[key] = value
+        self.memo[key] = nbytes
+        self.nbytes += nbytes
+        while self.budget is not None and self.nbytes > self.budget:
+            self._forget(next(iter(self.memo)))
+
+    def _forget(self, key):
+        self.nbytes -= self.memo.pop(key)
+        if isinstance(key, str):
+            dict.__delitem__(self, key)
+        else:
+            del self.parts[key]
+
+# datasets kept open with their decoded coordinates by open_dataset(ifn, cache=True)
+_datasets = {}
+
+def open_dataset(ifn, cache=False):
+    """Open a param file and decode its coordinates
+
+    Parameters
+    ----------
+    ifn : str
+       path or OPeNDAP url of the file
+    cache : bool
+       keep the dataset open and its coordinates decoded for the next call,
+       e.g. in a long-running process (see jscatd).  Use close_datasets()
+       to drop them, such as when the source has new time steps.
+
+    Returns
+    -------
+    nc : netCDF4.Dataset
+    coords : dict
+       dt, lat, lon (ndarrays) and level and level_units when the
+       param is on pressure levels
+    """
+    if ifn in _datasets:
+        return _datasets[ifn]
+    import netCDF4
+    nc = netCDF4.Dataset(ifn)
+    t = nc.variables['time']
+    coords = dict(dt = netCDF4.num2date(t[:], units=t.units, calendar=t.calendar),
+                  lat = nc.variables['latitude'][:].data,
+                  lon = nc.variables['longitude'][:].data)
+    if 'level' in nc.variables:
+        coords['level'] = nc.variables['level'][:].data
+        coords['level_units'] = nc.variables['level'].units
+    if cache:
+        _datasets[ifn] = (nc, coords)
+    return nc, coords
+
+def close_datasets():
+    """Close all datasets kept open by open_dataset(ifn, cache=True)"""
+    for nc, coords in _datasets.values():
+        nc.close()
+    _datasets.clear()
+
+def get_data(indir, BB, workers=1, max_request_bytes=2**26, cache=False, stride=None,
+             budget=None):
     """ Read in 4d-var ERA5 data
 
     Parameter
@@ -187,13 +809,28 @@ def get_data(indir, BB):
     BB : dictionary 
        Requires 4 keys (lat,lon,lvl,dt)
        Each key has value [min, max]
+       The lon range may cross the dateline (e.g. [150, -130]) and
+       optional key lon_closed=False makes it half-open (see lon_index)
+    workers : int
+       number of processes to fetch each param (see read_subset)
+    max_request_bytes : int
+       largest size of one request to the source (see read_subset)
+    cache : bool
+       keep param files open with coordinates decoded (see open_dataset)
+    stride : dict
+       get every n-th index within BB of dimensions dt, lat or lon,
+       e.g. dict(dt=4, lat=2, lon=2), read as strided hyperslabs
+    budget : int
+       bytes of derived quantities to keep once computed (see LazyData)
 
     Returns
     -------
-    d : dict of ndarrays and computed quantities
+    d : LazyData, dict of ndarrays and quantities computed when used
 
     """
 
+    from metpy.units import units
+
     # key words are used in filename but values are names with netcdf file
     params = {'hgt' : 'geopotential',
               'uwnd': 'u_component_of_wind',
@@ -209,72 +846,137 @@ def get_data(indir, BB):
     #
     print('Reading ERA5 data from: %s' % indir)
 
+    # names of variables within netcdf file
+    names = {'hgt': 'z', 'uwnd': 'u', 'vwnd': 'v', 'msl': 'msl'}
+    io = dict()
     for param in list(params.keys()):
         fn = '%s.%04d.nc' % (param, dt1.year) # each file year has one param
         # ifn = os.path.join(indir, fn)
         ifn = '/'.join([indir, fn])
-        nc = netCDF4.Dataset(ifn)
+        nc, coords = open_dataset(ifn, cache)
         varnames = list(nc.variables.keys())
         print(varnames)
-        t = nc.variables['time']
-        dt = netCDF4.num2date(t[:], units=t.units, calendar=t.calendar)
-        lat = nc.variables['latitude'][:].data
-        lon = nc.variables['longitude'][:].data
+        dt = coords['dt']
+        lat = coords['lat']
+        lon = coords['lon']
         
         # nonzero returns a tuple of idx per dimension
         # we're unpacking the tuple for each of these idx-vars
         (dtidx,) = np.logical_and(dt >= BB['dt'][0], dt < BB['dt'][1]).nonzero()
         (latidx,) = np.logical_and(lat >= BB['lat'][0], lat <= BB['lat'][1]).nonzero()
-        (lonidx,) = np.logical_and(lon >= BB['lon'][0], lon <= BB['lon'][1]).nonzero()
+        lonidx = lon_index(lon, BB['lon'], closed=BB.get('lon_closed', True))
+        if stride:
+            dtidx = dtidx[::stride.get('dt', 1)]
+            latidx = latidx[::stride.get('lat', 1)]
+            lonidx = lonidx[::stride.get('lon', 1)]
        
         if param in press_params:
-            level = nc.variables['level'][:].data
+            level = coords['level']
             (levidx,) =  np.logical_and(level >= BB['lvl'][0], level <= BB['lvl'][1]).nonzero()
-            level_units = nc.variables['level'].units
-        # get subset of data from file
+            level_units = coords['level_units']
+            idx = [dtidx, levidx, latidx, lonidx]
+        else:
+            idx = [dtidx, latidx, lonidx]
+        # get subset of data from file as hyperslabs
+        vname = names[param]
+        data, io[param] = read_subset(nc, vname, idx, workers, max_request_bytes)
+        data = data * units(nc.variables[vname].units)
         if param=='uwnd':
-            uwnd = nc.variables['u'][dtidx, levidx, latidx, lonidx].data * units(nc.variables['u'].units)
+            uwnd = data
         elif param=='vwnd':
-            vwnd = nc.variables['v'][dtidx, levidx, latidx, lonidx].data * units(nc.variables['v'].units)
+            vwnd = data
         elif param=='hgt':
-            geopot = nc.variables['z'][dtidx, levidx, latidx, lonidx].data * units(nc.variables['z'].units)
+            geopot = data
         elif param=='msl':
-            msl = nc.variables['msl'][dtidx, latidx, lonidx].data * units(nc.variables['msl'].units).to('hPa')
-        # close the param datafile
-        nc.close()
+            msl = data.to('hPa')
+        print('  %s: %d requests, %.1f MB in %.1f sec' %
+              (param, io[param]['requests'], io[param]['bytes']/2**20, io[param]['seconds']))
+        # close the param datafile unless kept open for next time
+        if ifn not in _datasets:
+            nc.close()
 
-    # -------------------------------
-    # do a calculation using metpy functions -- wspd(dt,level,lat,lon)
-    wspd = metpy.calc.wind_speed(uwnd, vwnd)
-    # compute geopotential height -- hgt(dt,level,lat,lon)
-    hgt = metpy.calc.geopotential_to_height(geopot)
-    
-    # compute height (1d) based on standard pressure -- ht(level)
-    ht_std = metpy.calc.pressure_to_height_std(level * units(level_units))
-    # we will be adjusting ht from ht_std by difference in msl from
-    # std pressure (1013.25 * units.hPa) at sea level
-    p0 = 1013.25 * units.hPa
-    # difference in pressure to add for each msl(dt,lat,lon)
-    pdiff = msl-p0
-
-    # collection of data for plots
-    d = dict()
+    # collection of data for plots, quantities derived from it (wspd,
+    # hgt, ht_std, pdiff, alt, ...) are computed when first used (see DERIVED)
+    d = LazyData(budget=budget)
     # dimensions within BB -- nparrays
     d['dt'] = dt[dtidx]
     d['lat']= lat[latidx]
     d['lon']= lon[lonidx]
     d['level']=level[levidx]
+    d['level_units'] = level_units
     # data already subset to BB and units attached -- Quantity object (nparray * units)
-    d['ht_std'] = ht_std # ht(level)
     d['msl'] = msl       # msl(dt,lat,lon)
-    d['hgt'] = hgt       # hgt(dt,level,lat,lon)
+    d['geopot'] = geopot # geopot(dt,level,lat,lon)
     d['uwnd']= uwnd      # uwnd(dt,level,lat,lon)
     d['vwnd']= vwnd      # vwnd(dt,level,lat,lon)
-    d['wspd']= wspd      # wspd(dt,level,lat,lon)
-    d['pdiff']=pdiff     # pdiff(dt,lat,lon)
+    # requests, bytes and seconds to read each param
+    d['io'] = io
 
     return d
 
+def region_view(d, BB):
+    """The part of d within BB, as views of the arrays of d (no copies)
+
+    For catalogs of several regions from one get_data() of their union
+    (see lon_union), so the data is got and derived once.  BB gives the
+    lat, lon and lvl of the region, which must be within those of d.  A
+    region is a slice of each dimension, unless its longitudes are not a
+    continuous run of those of d (a whole globe d with the region across
+    its start), when they are copied.  Quantities along all values of a
+    dim (uzonal, shear) are derived from the region's own values, the
+    same as from get_data() of the region.
+
+    Returns
+    -------
+    d : LazyData of the same keys, within BB
+    """
+    def as_slice(idx):
+        slices = index_slices(idx)
+        if len(slices) == 0:
+            return slice(0, 0)
+        if len(slices) == 1 and slices[0].step == 1:
+            return slices[0]
+        return idx
+
+    (latidx,) = np.logical_and(d['lat'] >= BB['lat'][0], d['lat'] <= BB['lat'][1]).nonzero()
+    (levidx,) = np.logical_and(d['level'] >= BB['lvl'][0], d['level'] <= BB['lvl'][1]).nonzero()
+    lonidx = lon_index(d['lon'], BB['lon'], closed=BB.get('lon_closed', True))
+    lats, levs, lons = as_slice(latidx), as_slice(levidx), as_slice(lonidx)
+    if not isinstance(lons, slice):
+        print('  lon %s to %s is copied, not a view' % tuple(BB['lon']))
+
+    # point-wise quantities of the region are views of those of d, the
+    # others (e.g. uzonal) are derived within it
+    view = dict(level=levs, lat=lats, lon=lons)
+    r = LazyData(budget=d.budget, parent=d, view=view)
+    for key, value in d.items():
+        if key not in DERIVED:
+            r[key] = _take(value, data_dims(key), view)
+        elif _pointwise(key):
+            r._remember(key, _take(value, data_dims(key), view))
+    return r
+
+def available_times(indir, dt_range, cache=False):
+    """Times within dt_range that every param file in indir has
+
+    New time steps are published one param at a time, so the end of the
+    data is the last time all of them have.
+
+    Returns
+    -------
+    dt : ndarray of datetimes, in order
+    """
+    avail = None
+    for param in ['hgt', 'uwnd', 'vwnd', 'msl']:
+        ifn = '/'.join([indir, '%s.%04d.nc' % (param, dt_range[0].year)])
+        nc, coords = open_dataset(ifn, cache)
+        dt = coords['dt']
+        dt = dt[np.logical_and(dt >= dt_range[0], dt < dt_range[1])]
+        avail = dt if avail is None else avail[np.isin(avail, dt)]
+        if ifn not in _datasets:
+            nc.close()
+    return avail
+
 def get_coastlines():
     # --------------------------
     # Global Self-consistent, Hierarchical, High-resolution Shoreline Database (gshhs)
@@ -287,6 +989,7 @@ def get_coastlines():
     # gshhs_c = coarse
     # lineurl  = 'http://opendap.deltares.nl/thredds/dodsC/opendap/noaa/gshhs/gshhs_i.nc';
     lineurl  = 'http://whewell.marine.unc.edu/dods/gshhs/gshhs_i.nc'
+    import netCDF4
 
     # Get coatline line data: 1D vectors are small, so we can get all data
     # opendap(url_line) # when netCDF4 was not compiled with OPeNDAP
@@ -310,14 +1013,269 @@ def generate_columns(types_str='JSDT JSLVL JSLAT JSLON JSHT WSPD UWND VWND HGT')
         c[label]=m.index(label) # c['VFLG']=4
     return c
 
+def jet_table(d, jsidx):
+    """Catalogue values at the jet stream indices found by find_jets()
+
+    Parameters
+    ----------
+    d : dict of ndarrays and computed quantities
+      from d = get_data(indir,BB)
+    jsidx : numpy array of integers nx4
+       columns as [dtidx, zidx, latidx, lonidx] for each peak found
+
+    Returns
+    -------
+    js : numpy array of strings nx9
+       rows of date and time, then columns of types_str, ready for write_jet_data()
+    types_str : str
+       column types of the table (minus the date and time column)
+    """
+    # get location data values from indices
+    # this helps cleanup notation
+    idxdt, idxlvl, idxlat, idxlon = jsidx[:,0],jsidx[:,1],jsidx[:,2],jsidx[:,3]
+
+    # initialize js1 array to hold data (minus JSDT)
+    types_str='JSLVL JSLAT JSLON JSHT WSPD UWND VWND HGT'
+    c = generate_columns(types_str)
+    
+    nrows, _ = jsidx.shape
+    ncols = len(c)
+    js1 = np.ones(shape=(nrows,ncols))*np.nan
+    dt = np.zeros(shape=(nrows,1), dtype='U25') 
+    
+    # get datetimes but convert to string YYYYMMDD_HHMM first for writing to file
+    for i, idx in enumerate(idxdt):
+        # js[i,c['JSDT']] 
+        dt[i] = d['dt'][idx].strftime("  %Y %m %d %H %M %S")
+
+    # get position data
+    js1[:,c['JSLAT']] = d['lat'][idxlat]
+    js1[:,c['JSLON']] = d['lon'][idxlon]
+    js1[:,c['JSLVL']] = d['level'][idxlvl]
+    
+    # get parameter data at indices, derived only there metpy (dot.m)
+    at = dict(dt=idxdt, level=idxlvl, lat=idxlat, lon=idxlon)
+    js1[:,c['WSPD']] = d.take('wspd', **at)
+    js1[:,c['UWND']] = d.take('uwnd', **at)
+    js1[:,c['VWND']] = d.take('vwnd', **at)
+    js1[:,c['HGT']] = d.take('hgt', **at)
+    
+    # compute geometric altitude (height) from pressure level 
+    # adjusted for msl pressure at time, lat, lon (see _alt)
+    js1[:,c['JSHT']] = d.take('alt', **at).m
+    
+    # pre-pend column of dates to rest of js data
+    # this will cause the js1 data to be printed as strings 
+    # but that is okay at this step because we are ready to write
+    # this out to a text file.
+    js = np.column_stack((dt, js1))
+    return js, types_str
+
+def catalog_jets(indir, BB, p={}, workers=1, cache=False, backend='skimage', check=None):
+    """Get data within BB and catalogue jets found at each date/time
+
+    Everything needed is loaded and released within the call, so the
+    memory used depends only on the size of BB.  This is the unit of
+    work for each longitude tile of a tiled catalog (see lon_tiles).
+
+    workers is the number of processes to read each param and cache keeps
+    the param files open for the next call (see get_data).  Jets are found
+    with backend, and compared with those of backend check if given.
+
+    Returns
+    -------
+    js, types_str : from jet_table()
+    """
+    d = get_data(indir, BB, workers, cache=cache)
+
+    jsidx = find_all_jets(d, p, backend)
+    if check:
+        compare_jets(d, p, (backend, check))
+
+    return jet_table(d, jsidx)
+
+# jet detection backends by name (see find_all_jets)
+jet_backends = {'skimage': _jets_skimage,
+                'numba': _jets_numba}
+
+def compare_jets(d, p={}, backends=('skimage', 'numba'), dtidxs=None):
+    """Check two find_jets() backends give the same catalog
+
+    Returns
+    -------
+    diff : dict
+       number of jets found by each backend, number in common, and the
+       jsidx rows found by only one of them (only_0, only_1)
+    """
+    found = [find_all_jets(d, p, backend, dtidxs) for backend in backends]
+    rows = [set(map(tuple, jsidx)) for jsidx in found]
+    diff = dict(backends=list(backends),
+                counts=[len(jsidx) for jsidx in found],
+                common=len(rows[0] & rows[1]),
+                only_0=np.array(sorted(rows[0] - rows[1]), dtype=int).reshape(-1,4),
+                only_1=np.array(sorted(rows[1] - rows[0]), dtype=int).reshape(-1,4))
+    diff['same'] = (diff['only_0'].size == 0 and diff['only_1'].size == 0
+                    and np.array_equal(found[0], found[1]))
+    print('%s: %d jets, %s: %d jets, %d in common%s' %
+          (backends[0], diff['counts'][0], backends[1], diff['counts'][1], diff['common'],
+           ' (same)' if diff['same'] else ''))
+    return diff
+
+def replace_file(ofn, write, mode='w'):
+    """Write ofn with write(f) to a temp file of its own then renamed
+
+    A reader never sees a partial file, and writers at once never share
+    a temp file.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(ofn) or '.',
+                               prefix=os.path.basename(ofn) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        # mkstemp makes it private to the user
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, ofn)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+@contextlib.contextmanager
+def catalog_lock(ofn):
+    """Hold an exclusive lock on catalog ofn (on ofn.lock), e.g. from
+    reading its last jet through appending to it, so runs at once (such
+    as from cron) take turns"""
+    with open(ofn + '.lock', 'a') as f:
+        try:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+        except ImportError:
+            # Windows, locked until closed
+            import msvcrt
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        yield
+
 def write_jet_data(ofn, header, js):
-    """Write header and data. """
-    f = open(ofn, 'w')
-    if header[-1] == '\n':
-        f.write(header)
-    else:
-        f.write(header+'\n')
-    # if there is any data, save to the file)
-    if js.size > 0:
-        np.savetxt(f, js, fmt='%s')
-    f.close()
+    """Write header and data. 
+
+    The file is written to a temp file then renamed (see replace_file),
+    so a reader never sees a partial catalog.
+    """
+    def write(f):
+        if header[-1] == '\n':
+            f.write(header)
+        else:
+            f.write(header+'\n')
+        # if there is any data, save to the file)
+        if js.size > 0:
+            np.savetxt(f, js, fmt='%s')
+    replace_file(ofn, write)
+
+def jet_records(js, types_str):
+    """Catalogue table from jet_table() as a structured array
+
+    This is the binary catalog (js_YYYY_MM.npy), one record per jet with
+    the date and time as field JSDT (datetime64[s]) and a float field for
+    each of the column types.
+    """
+    names = types_str.split()
+    recs = np.empty(len(js), dtype=[('JSDT', 'datetime64[s]')] + [(name, 'f8') for name in names])
+    if len(js):
+        ymdhms = np.array([s.split() for s in js[:,0]], dtype=int)
+        recs['JSDT'] = [datetime.datetime(*t) for t in ymdhms]
+        for i, name in enumerate(names):
+            recs[name] = js[:,i+1].astype(float)
+    return recs
+
+def write_jet_records(ofn, recs):
+    """Write the binary catalog, to a temp file then renamed as for write_jet_data()"""
+    replace_file(ofn, lambda f: np.save(f, recs), 'wb')
+
+def append_jet_data(ofn, js, types_str):
+    """Append rows of jet_table() to an existing catalog, text or binary (.npy)
+
+    The catalog is copied to a temp file with the new rows added and
+    then renamed, so a reader sees the catalog before or after the
+    append, never part way.  Runs that may append at once should hold
+    catalog_lock(ofn) from last_jet_time() through the append.
+    """
+    if ofn.endswith('.npy'):
+        recs = np.load(ofn, mmap_mode='r')
+        write_jet_records(ofn, np.concatenate([recs, jet_records(js, types_str)]))
+        return
+    def write(f):
+        with open(ofn) as src:
+            shutil.copyfileobj(src, f)
+        if js.size > 0:
+            np.savetxt(f, js, fmt='%s')
+    replace_file(ofn, write)
+
+def read_jet_data(ifn, cache=True):
+    """Read a catalog, text or binary (.npy), as records (see jet_records)
+
+    A binary catalog is memory mapped, so only the records used are read.
+    A text catalog is parsed, and with cache the records are saved to
+    ifn.npy and memory mapped from there next time, unless the catalog
+    has changed since or ifn.npy cannot be written.
+
+    Returns
+    -------
+    recs : structured ndarray, or memmap of it
+    """
+    if ifn.endswith('.npy'):
+        return np.load(ifn, mmap_mode='r')
+    cfn = ifn + '.npy'
+    if cache and os.path.exists(cfn) and os.path.getmtime(cfn) >= os.path.getmtime(ifn):
+        return np.load(cfn, mmap_mode='r')
+    # column types from the header, after the date and time
+    types_str = ''
+    with open(ifn) as f:
+        for line in f:
+            if not line.startswith('#'):
+                break
+            if line.startswith('# TableColumnTypes:'):
+                types_str = line.split(':', 1)[1]
+    names = types_str.split()[6:]
+    data = np.loadtxt(ifn, comments='#', ndmin=2).reshape(-1, 6+len(names))
+    recs = np.empty(len(data), dtype=[('JSDT', 'datetime64[s]')] + [(name, 'f8') for name in names])
+    # YYYY MM DD hh mm ss as datetime64
+    ym = ((data[:,0]-1970)*12 + data[:,1]-1).astype('datetime64[M]')
+    recs['JSDT'] = (ym.astype('datetime64[D]') + (data[:,2]-1).astype('timedelta64[D]')
+                    + (data[:,3]*3600 + data[:,4]*60 + data[:,5]).astype('timedelta64[s]'))
+    for i, name in enumerate(names):
+        recs[name] = data[:,6+i]
+    if cache:
+        try:
+            write_jet_records(cfn, recs)
+        except OSError as e:
+            # e.g. a read-only directory of catalogs, parsed each time then
+            print(f"  {cfn} not cached: {e.strerror}")
+        else:
+            # mapped, so the parsed records are not kept in memory
+            return np.load(cfn, mmap_mode='r')
+    return recs
+
+def last_jet_time(ifn):
+    """Date and time of the last jet in a catalog, text or binary (.npy)
+
+    Only the end of the catalog is read.
+
+    Returns
+    -------
+    dt : datetime, or None if the catalog has no jets
+    """
+    if ifn.endswith('.npy'):
+        recs = np.load(ifn, mmap_mode='r')
+        if len(recs) == 0:
+            return None
+        return recs['JSDT'][-1].astype(datetime.datetime)
+    with open(ifn, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        start = f.seek(max(0, size - 4096))
+        lines = f.read().decode().splitlines()
+    # first line may be cut part way unless at start of file
+    if start > 0:
+        lines = lines[1:]
+    rows = [line for line in lines if line.strip() and not line.startswith('#')]
+    if not rows:
+        return None
+    return datetime.datetime(*map(int, rows[-1].split()[:6]))
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# coding: utf-8
+r""" Jetstream catalogue viewer (jsview) for browsing months or years of jets
+
+Plots the jets catalogued by jscat (js_YYYY_MM.txt or .npy) without the
+ERA5 data, so it starts in seconds and needs little memory however many
+months are browsed.  Binary catalogs are memory mapped and text ones
+parsed once and cached as records (see read_jet_data), then only an
+index of the rows of each time step is kept in memory.
+
+Plots:
+
+(1) Map of the jets at a given time (and the time steps before it, see
+--window) coloured by wind speed, over the density of all jets of the
+months viewed.
+
+GUI:
+   Time slider across all months, with prev and next buttons
+   Month selector to jump to the first time of a month
+   Density ON/OFF button
+
+Usage:
+Using IPython console, use magic to run code as if at unix prompt and
+provide the directory of catalogs and optionally the first and last month
+%run jsview.py [catdir] [first] [last]
+
+In[]: cd Dropbox/peach/era5
+In[]: %run jsview.py ./data 2017_01 2018_12
+In[]: plt.show()
+
+Show the jets of the last day (4 time steps) at each time, at most
+5000 of them
+In[]: %run jsview.py ./data --window 4 --max-points 5000
+
+"""
+
+import os
+import re
+import argparse
+from jsutil import *
+
+import matplotlib.pyplot as plt
+import matplotlib.gridspec as gs
+from matplotlib.widgets import Slider, Button, TextBox
+
+# suppress warnings
+import warnings
+warnings.filterwarnings("ignore")
+
+# catalogs (records) of each month, in order, and index of time steps
+# across them -- times, and catalog and rows [start, stop) of each
+cats = []
+cat_months = []
+times = np.array([], dtype='datetime64[s]')
+tcat = np.array([], dtype=int)
+tstart = np.array([], dtype=int)
+tstop = np.array([], dtype=int)
+
+# jets shown at each time are those of the window of time steps up to
+# it, decimated to at most max_points
+window = 1
+max_points = 20000
+
+# density of jets of all months on a grid of density_bin degrees
+density_bin = 2.0
+density = None
+
+def find_catalogs(catdir, first=None, last=None):
+    """ catalogs of each month in catdir from first to last (YYYY_MM),
+    the binary one (.npy) if a month has both
+
+    Returns
+    -------
+    found : list of (yyyy_mm, path) in order of month
+    """
+    found = {}
+    for fn in sorted(os.listdir(catdir)):
+        m = re.match(r'js_(\d{4}_\d{2})\.(txt|npy)$', fn)
+        if not m:
+            continue
+        yyyy_mm = m.group(1)
+        if (first and yyyy_mm < first) or (last and yyyy_mm > last):
+            continue
+        if yyyy_mm not in found or fn.endswith('.npy'):
+            found[yyyy_mm] = '/'.join([catdir, fn])
+    return sorted(found.items())
+
+def load_catalogs(catdir, first=None, last=None):
+    """ map the catalogs of catdir (see find_catalogs), index their time
+    steps and count the density of their jets
+    """
+    global cats, cat_months, times, tcat, tstart, tstop, density
+    found = find_catalogs(catdir, first, last)
+    if not found:
+        raise ValueError(f"No catalogs js_YYYY_MM.txt or .npy in {catdir}")
+    cats, cat_months = [], []
+    index = []
+    lon_edges = np.arange(-180., 360.+density_bin, density_bin)
+    lat_edges = np.arange(-90., 90.+density_bin, density_bin)
+    counts = np.zeros((len(lon_edges)-1, len(lat_edges)-1))
+    print(f"Reading {len(found)} catalog(s) from {catdir} ... ")
+    for yyyy_mm, ifn in found:
+        recs = read_jet_data(ifn)
+        # catalogs are in order of time, so rows of a time are one run
+        t = np.asarray(recs['JSDT'])
+        ts, start = np.unique(t, return_index=True)
+        stop = np.append(start[1:], len(t))
+        index.append((ts, np.full(len(ts), len(cats)), start, stop))
+        c, _, _ = np.histogram2d(recs['JSLON'], recs['JSLAT'], bins=[lon_edges, lat_edges])
+        counts += c
+        cats.append(recs)
+        cat_months.append(yyyy_mm)
+    times, tcat, tstart, tstop = [np.concatenate(a) for a in zip(*index)]
+    # lon of catalogs in either convention (-180 to 180 or 0 to 360)
+    lons = (lon_edges[:-1] + lon_edges[1:])/2.
+    lats = (lat_edges[:-1] + lat_edges[1:])/2.
+    density = dict(lon=lons, lat=lats, counts=counts.T)
+    print(f"  {len(times)} time steps, {int(counts.sum())} jets")
+
+def jets_at(tidx):
+    """ jets of the window of time steps up to tidx, decimated to at
+    most max_points
+
+    Returns
+    -------
+    lon, lat, wspd : ndarrays
+    """
+    parts = []
+    for i in range(max(0, tidx-window+1), tidx+1):
+        recs = cats[tcat[i]][tstart[i]:tstop[i]]
+        parts.append(np.column_stack((recs['JSLON'], recs['JSLAT'], recs['WSPD'])))
+    jets = np.vstack([np.empty((0,3))] + parts)
+    if len(jets) > max_points:
+        jets = jets[::-(-len(jets)//max_points)]
+    return jets[:,0], jets[:,1], jets[:,2]
+
+def setup_figure():
+    """ setup figure layout with map and colorbar axes
+    """
+    global fig, ax, t1, jsmap, dens, cmap
+    fig = plt.figure(figsize=(10, 7.5))
+    ax = fig.add_axes((.1,.12,.8,.68))
+
+    t1 = ax.set_title('YYYY_MM_DD_HHMM', loc='left')
+    ax.set_title('jets coloured by wspd (m/sec),\ndensity of jets', loc='right')
+    ax.set_xlabel('Longitude (deg)')
+    ax.set_ylabel('Latitude (deg)')
+
+    # extent of all the jets, or the globe if the catalogs have none
+    lon = [[recs['JSLON'].min(), recs['JSLON'].max()] for recs in cats if len(recs)]
+    lat = [[recs['JSLAT'].min(), recs['JSLAT'].max()] for recs in cats if len(recs)]
+    if not lon:
+        lon, lat = [[-180., 180.]], [[-90., 90.]]
+    lon, lat = np.concatenate(lon), np.concatenate(lat)
+    ax.set_xlim(lon.min()-density_bin, lon.max()+density_bin)
+    ax.set_ylim(lat.min()-density_bin, lat.max()+density_bin)
+    # set aspect to simply mimic equidistant projection
+    ax.set_aspect(1/np.cos(np.pi*np.mean(ax.get_ylim())/180.))
+
+    # density of all jets, then coastline/lakes
+    dens = ax.pcolormesh(density['lon'], density['lat'],
+                         np.ma.masked_equal(density['counts'], 0),
+                         cmap=plt.get_cmap('Greys'), alpha=0.5, shading='nearest')
+    ax.plot(lines['lon'], lines['lat'], 'k', linewidth=0.5)
+
+    # jets of the time shown
+    cmap = plt.get_cmap('BuPu')
+    jsmap = ax.scatter([], [], c=[], s=12, cmap=cmap, vmin=20, vmax=90)
+    cbar = fig.colorbar(jsmap, cax=fig.add_axes((.1,.05,.8,.02)), orientation='horizontal')
+    cbar.set_label('Wind Speed (m/sec)')
+
+def setup_gui():
+    """ setup widgets for time slider, buttons, month selector and toggle
+    """
+    global sdt, bdtprev, bdtnext, text_month, bdens
+    ogs = fig.add_gridspec(5,4, left=0.05, right=0.95, top=0.95, bottom=0.05)
+
+    igs = gs.GridSpecFromSubplotSpec(4,1,subplot_spec=ogs[0,0:3], hspace=0.2)
+    # Date slider across all months
+    sdt = Slider(fig.add_subplot(igs[1]), 'Date', 0, max(len(times)-1, 0),
+                 valinit=0, valstep=1, valfmt='%d')
+    sdt.on_changed(update_plot)
+    # nothing to slide through with one time step or none
+    sdt.set_active(len(times) > 1)
+    # Month selector
+    text_month = TextBox(fig.add_subplot(igs[2]), 'Month', initial=cat_months[0])
+    text_month.on_submit(select_month)
+
+    igs = gs.GridSpecFromSubplotSpec(4,4,subplot_spec=ogs[0,3], hspace=0.2)
+    # Date prev and next buttons
+    bdtprev = Button(fig.add_subplot(igs[1,0]), '<')
+    bdtprev.on_clicked(prev_dt)
+    bdtnext = Button(fig.add_subplot(igs[1,1]), '>')
+    bdtnext.on_clicked(next_dt)
+    # Density hide/show
+    bdens = Button(fig.add_subplot(igs[2,0:2]), label='Density ON', color='green', hovercolor='green')
+    bdens.on_clicked(toggle_density)
+
+def update_plot(val):
+    # when dt slider changes
+    tidx = int(sdt.val)
+    if tidx >= len(times):
+        # no jets in any catalog
+        t1.set_text('no jets')
+        fig.canvas.draw_idle()
+        return
+    lon, lat, wspd = jets_at(tidx)
+    jsmap.set_offsets(np.column_stack((lon, lat)))
+    jsmap.set_array(wspd)
+    t1.set_text(times[tidx].astype(datetime.datetime).strftime("%Y_%m_%d_%H%M"))
+    fig.canvas.draw_idle()
+
+def prev_dt(val):
+    if sdt.val > 0:
+        sdt.set_val(sdt.val-1)
+
+def next_dt(val):
+    if sdt.val < len(times)-1:
+        sdt.set_val(sdt.val+1)
+
+def select_month(text):
+    """ show the first time of month YYYY_MM """
+    yyyy_mm = text.strip()
+    if yyyy_mm not in cat_months:
+        print(f"No catalog of {yyyy_mm}")
+        return
+    (tidx,) = (tcat == cat_months.index(yyyy_mm)).nonzero()
+    if len(tidx):
+        sdt.set_val(tidx[0])
+
+def toggle_density(val):
+    dens.set_visible(not dens.get_visible())
+    if dens.get_visible():
+        bdens.label.set_text('Density ON')
+        bdens.ax.set_facecolor('green')
+    else:
+        bdens.label.set_text('Density OFF')
+        bdens.ax.set_facecolor('red')
+    plt.draw()
+
+def main():
+    """ map the catalogs, then build and initialize the figure
+    """
+    global lines, window, max_points, density_bin
+    parser = argparse.ArgumentParser(description='Jetstream catalogue viewer (jsview)')
+    parser.add_argument('catdir', nargs='?', default='./data', help='directory of catalogs (js_YYYY_MM.txt or .npy)')
+    parser.add_argument('first', nargs='?', help='first month YYYY_MM, default the first found')
+    parser.add_argument('last', nargs='?', help='last month YYYY_MM, default the last found')
+    parser.add_argument('--window', type=int, default=1, metavar='N',
+                        help='show the jets of the N time steps up to the time shown')
+    parser.add_argument('--max-points', type=int, default=20000,
+                        help='decimate the jets shown to at most this many')
+    parser.add_argument('--density-bin', type=float, default=2.0, metavar='DEG',
+                        help='size in degrees of the grid of jet density')
+    # months may follow the options
+    args = parser.parse_intermixed_args()
+    window = max(1, args.window)
+    max_points = max(1, args.max_points)
+    density_bin = args.density_bin
+
+    load_catalogs(args.catdir, args.first, args.last)
+    # grab the coastline dataset
+    lines = get_coastlines()
+
+    setup_figure()
+    setup_gui()
+    update_plot(0)
+    plt.draw()
+
+if __name__ == "__main__":
+    main()
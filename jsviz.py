@@ -11,6 +11,9 @@ wspd and hgt through upper troposphere as latitude vs altitude.
 GUI:
    Longitude slider with prev and next buttons
    Time slider with prev and next buttons
+   Month selector with prev and next buttons.  The previous and next
+   months are loaded in the background, so stepping the time past the
+   end of the month continues into the next one.
 
 Usage:
 Using IPython console, use magic to run code as if at unix prompt and
@@ -24,12 +27,24 @@ In[]: cd Dropbox/peach/era5
 In[]: %run jsviz.py 2018_01
 In[]: plt.show()
 
+Find jets with the compiled (numba) backend instead of skimage
+In[]: %run jsviz.py 2018_01 --backend numba
+
+Show every 8th time step on a 2x coarser grid within seconds, and
+switch to full resolution once loaded in the background
+In[]: %run jsviz.py 2018_01 --progressive 8
+
+Importing jsviz does no I/O; data is loaded by main() (or load_data())
+when run as a script.
+
 Still TODO:
    (Select how vertical section is plotted: press lvl or standard alt or msl altitude)
 
 """
 
-import sys
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
 from jsutil import *
 
 import matplotlib.pyplot as plt
@@ -54,92 +69,116 @@ BB_fig = dict( lon=[-140, -50],
                dt = [datetime.datetime(2017,1,1), datetime.datetime(2017,2,1)]
                )
 
-# grab the coastline dataset
-lines = get_coastlines()
-
 # empty array for jet stream indices in data
 js = np.array([])
 # js column order defined as [JSDT,JSLVL,JSLAT,JSLON]
 JSDT,JSLVL,JSLAT,JSLON = 0,1,2,3
 
-lm = { 'num_peaks' : 4,
-       'min_distance' : 3,
-       'exclude_border' : 0,
-       'threshold_abs': 40.,
-       #
-       'peaks_inside_toggle': 1,
-       'peaks_inside_threshold': 30.,
-       'peaks_inside_zonal_max': 0}
-
-
-# setup figure layout 
-fig = plt.figure(figsize=(10, 7.5))
-axs = [fig.add_axes((.1,.1,.6,.7)),0,0]
-
-# main map
-title1_str = 'avg wspd (100-400 hPa), \nhgt (300 hPa), msl pressure (hPa)'
-axs[0].set_title(title1_str, loc='right')
-t1 = axs[0].set_title('YYYY_MM_DD_HHMM', loc='left')
-# set aspect to simply mimic equidistant projection
-axs[0].set_aspect(1/np.cos(np.pi*np.mean(BB_fig['lat'])/180.)) 
-axs[0].set_xlim(BB_fig['lon'][0],BB_fig['lon'][1])
-axs[0].set_ylim(BB_fig['lat'][0],BB_fig['lat'][1])
-axs[0].set_xlabel('Longitude (deg)')
-axs[0].set_ylabel('Latitude (deg)')
-# plot coastline/lakes
-axs[0].plot(lines['lon'],lines['lat'],'k',linewidth=0.5)
-# plot dotted vertical line at longitude of section plot
-l1 = axs[0].axvline(x=0, color='b', linestyle=':', linewidth=3.0)
-
-# wpsd color bar
-# get_positions returns Bbox, we want Bbox.bounds
-l,b,w,h = axs[0].get_position().bounds
-axs[1] = fig.add_axes([l,b-0.075,w,0.02])
-
-# do this now so that we can get adjusted ax get_position
-plt.draw()
-plt.pause(0.01)
-
-# vertical section
-l,b,w,h = axs[0].get_position().bounds
-axs[2] = fig.add_axes((l+w+0.01,b,.2,h))
-
-# some customizations (called on the axes of the section)
-title2_str = 'Section at lon=%.1f' % 0
-t2 = axs[2].set_title(title2_str)
-axs[2].set_ylim(BB_fig['lat'][0],BB_fig['lat'][1])
-# ax.set_xlabel('Level (hPa)')
-# ax.invert_xaxis()
-axs[2].set_xlabel('Altitude (km)')
-axs[2].yaxis.tick_right()
-axs[2].yaxis.set_label_position('right')
-axs[2].set_ylabel('Latitude (deg)')
-
-# blank data for initiating contours
-blank = np.array(np.ones((2,2), dtype=float))
-
-# plot filled contour for wmap(lon,lat)
-cflines = np.arange(20,100,10)
-cmap = plt.cm.get_cmap('BuPu')
-cf1 = axs[0].contourf(blank, blank, blank, cflines, cmap=cmap)
-# contour lines for hmap(lon,lat) and pmap(lon,lat)
-cslines1 = np.arange(7000, 11000, 100)
-cs11 = axs[0].contour(blank, blank, blank, cslines1, colors='k', linewidths=1.0, linestyles='solid')
-cs12 = axs[0].contour(blank, blank, blank, np.arange(870,1013,2),colors='gray', linewidths=1.0, linestyles='dashed')
-cs13 = axs[0].contour(blank, blank, blank, np.arange(1014,1085,2), colors='gray', linewidths=1.0, linestyles='solid')
-
-# plot filled contour lines for wsec(level, lat)
-cf2 = axs[2].contourf(blank, blank, blank, cflines, cmap=cmap)
-# plot line of hgt of 300hPa surface at lon
-l3, = axs[2].plot([], [], 'k-', linewidth=1.0)
-cslines2 = np.arange(100, 600, 100)
-cs2 = axs[2].contour(blank, blank, blank, cslines2, colors='b', linewidths=1.0, linestyles='solid')
-
-# eventually will try determine polar jet stream (pjs) and subtropical js (stjs)
-# plot jet stream locations on map
-jsmap, = axs[0].plot([],[], 'ro', markersize=6)
-# and on vertical section
-jsvec, = axs[2].plot([],[], 'ro', markersize=6)
+# params for find_jets() and its backend
+lm = dict(jet_params)
+backend = 'skimage'
+
+# progressive loading, stride of coarse data in d (None when full resolution)
+# and future of the full resolution data being loaded in the background
+coarse = None
+full_data = None
+# background loader (thread pool) and timer checking on it
+loader = None
+timer = None
+
+# level of detail of map contours, at least lod_pixels screen pixels per
+# grid cell, the grid drawn (lod_key) and all inputs of the map drawn
+# (map_key), so the same map is not contoured and labelled again
+lod_pixels = 3
+lod_key = None
+map_key = None
+
+# month shown, and futures of data of months loaded or being loaded,
+# least recently shown first, keeping up to max_months in memory
+month = None
+months = OrderedDict()
+max_months = 3
+# bytes of derived fields (wspd, hgt, ...) kept for each month, computed
+# for only the time, section and view shown (see LazyData)
+budget = 2**28
+
+
+def setup_figure():
+    """ setup figure layout with map, colorbar and vertical section axes
+    """
+    global fig,axs,t1,t2,l1,jsmap,jsvec,l3,cf1,cf2,cs11,cs12,cs13,cs2
+    global cmap,cflines,cslines1,cslines2
+    # setup figure layout 
+    fig = plt.figure(figsize=(10, 7.5))
+    axs = [fig.add_axes((.1,.1,.6,.7)),0,0]
+
+    # main map
+    title1_str = 'avg wspd (100-400 hPa), \nhgt (300 hPa), msl pressure (hPa)'
+    axs[0].set_title(title1_str, loc='right')
+    t1 = axs[0].set_title('YYYY_MM_DD_HHMM', loc='left')
+    # set aspect to simply mimic equidistant projection
+    axs[0].set_aspect(1/np.cos(np.pi*np.mean(BB_fig['lat'])/180.)) 
+    axs[0].set_xlim(BB_fig['lon'][0],BB_fig['lon'][1])
+    axs[0].set_ylim(BB_fig['lat'][0],BB_fig['lat'][1])
+    axs[0].set_xlabel('Longitude (deg)')
+    axs[0].set_ylabel('Latitude (deg)')
+    # plot coastline/lakes
+    axs[0].plot(lines['lon'],lines['lat'],'k',linewidth=0.5)
+    # plot dotted vertical line at longitude of section plot
+    l1 = axs[0].axvline(x=0, color='b', linestyle=':', linewidth=3.0)
+    # redraw map contours at the level of detail for the zoom, once both
+    # lon and lat of a new view are set and drawn
+    fig.canvas.mpl_connect('draw_event', update_map_view)
+
+    # wpsd color bar
+    # get_positions returns Bbox, we want Bbox.bounds
+    l,b,w,h = axs[0].get_position().bounds
+    axs[1] = fig.add_axes([l,b-0.075,w,0.02])
+
+    # do this now so that we can get adjusted ax get_position
+    plt.draw()
+    plt.pause(0.01)
+
+    # vertical section
+    l,b,w,h = axs[0].get_position().bounds
+    axs[2] = fig.add_axes((l+w+0.01,b,.2,h))
+
+    # some customizations (called on the axes of the section)
+    title2_str = 'Section at lon=%.1f' % 0
+    t2 = axs[2].set_title(title2_str)
+    axs[2].set_ylim(BB_fig['lat'][0],BB_fig['lat'][1])
+    # ax.set_xlabel('Level (hPa)')
+    # ax.invert_xaxis()
+    axs[2].set_xlabel('Altitude (km)')
+    axs[2].yaxis.tick_right()
+    axs[2].yaxis.set_label_position('right')
+    axs[2].set_ylabel('Latitude (deg)')
+
+    # blank data for initiating contours
+    blank = np.array(np.ones((2,2), dtype=float))
+
+    # plot filled contour for wmap(lon,lat)
+    cflines = np.arange(20,100,10)
+    cmap = plt.cm.get_cmap('BuPu')
+    cf1 = axs[0].contourf(blank, blank, blank, cflines, cmap=cmap)
+    # contour lines for hmap(lon,lat) and pmap(lon,lat)
+    cslines1 = np.arange(7000, 11000, 100)
+    cs11 = axs[0].contour(blank, blank, blank, cslines1, colors='k', linewidths=1.0, linestyles='solid')
+    cs12 = axs[0].contour(blank, blank, blank, np.arange(870,1013,2),colors='gray', linewidths=1.0, linestyles='dashed')
+    cs13 = axs[0].contour(blank, blank, blank, np.arange(1014,1085,2), colors='gray', linewidths=1.0, linestyles='solid')
+
+    # plot filled contour lines for wsec(level, lat)
+    cf2 = axs[2].contourf(blank, blank, blank, cflines, cmap=cmap)
+    # plot line of hgt of 300hPa surface at lon
+    l3, = axs[2].plot([], [], 'k-', linewidth=1.0)
+    cslines2 = np.arange(100, 600, 100)
+    cs2 = axs[2].contour(blank, blank, blank, cslines2, colors='b', linewidths=1.0, linestyles='solid')
+
+    # eventually will try determine polar jet stream (pjs) and subtropical js (stjs)
+    # plot jet stream locations on map
+    jsmap, = axs[0].plot([],[], 'ro', markersize=6)
+    # and on vertical section
+    jsvec, = axs[2].plot([],[], 'ro', markersize=6)
 
 def update_section_plot(val):
     # when lon slider changes
@@ -147,6 +186,8 @@ def update_section_plot(val):
     dtidx = int(sdt.val)
     lonidx = int(slon.val)
 
+    import metpy.calc
+
     # need to subset js for this longitude
     thislon = np.where( d['lon'][js[:,JSLON]] == d['lon'][lonidx] )
     which_lats = js[thislon,JSLAT]
@@ -155,7 +196,9 @@ def update_section_plot(val):
     jsvec.set_ydata(yy)
 
     # determine ht at these lats for jet stream locatios
-    ht = metpy.calc.add_pressure_to_height(d['ht_std'][which_lvls], d['pdiff'][dtidx,which_lats,lonidx].squeeze())
+    # pdiff(lat) of section
+    pdiff = d.take('pdiff', dt=dtidx, lon=lonidx)
+    ht = metpy.calc.add_pressure_to_height(d['ht_std'][which_lvls], pdiff[which_lats].squeeze())
     xx = ht.m
     jsvec.set_xdata(xx)
 
@@ -165,8 +208,8 @@ def update_section_plot(val):
     # add units for metpy.calc
     hts_std = hts_std * d['ht_std'].units
     # compute new hts based on adding pdiff to standard heights
-    hts = metpy.calc.add_pressure_to_height(hts_std, d['pdiff'][dtidx,:,lonidx].squeeze())
-    wsec = d['wspd'][dtidx,:,:,lonidx].squeeze()
+    hts = metpy.calc.add_pressure_to_height(hts_std, pdiff.squeeze())
+    wsec = d.take('wspd', dt=dtidx, lon=lonidx).squeeze()
     # move the lon line and change title
     l1.set_xdata([ d['lon'][lonidx], d['lon'][lonidx]])
     title2_str = 'Section at lon=%.1f' % d['lon'][lonidx]
@@ -181,12 +224,13 @@ def update_section_plot(val):
 
     # pick data of 300hPa surface from hgt
     (lev300,) = (d['level']==300).nonzero()
-    hsec = d['hgt'][dtidx,lev300,:,lonidx].squeeze()
+    hgt = d.take('hgt', dt=dtidx, lon=lonidx)
+    hsec = hgt[lev300,:].squeeze()
     # 
     l3.set_xdata(hsec)
     l3.set_ydata(d['lat'])
     
-    hsec = d['hgt'][dtidx,:,:,lonidx].squeeze()
+    hsec = hgt.squeeze()
     # remove previous contours and labels
     for tp in cs2.collections:
         tp.remove()
@@ -201,27 +245,62 @@ def update_section_plot(val):
 
     plt.draw()
 
-def update_both_plot(val):
-    # when dt slider changes
-    global js,jsmap,l3,cf1,cf2,cs11,cs12,cs13,cs2
+def map_view(ax, lon, lat):
+    """ slices of lat and lon in view of ax, and size of blocks of grid
+    cells to average so there are at least lod_pixels per cell on screen
+    """
+    x0, x1 = sorted(ax.get_xlim())
+    y0, y1 = sorted(ax.get_ylim())
+    view = []
+    for x, lo, hi in ((lat, y0, y1), (lon, x0, x1)):
+        (idx,) = ((x >= lo) & (x <= hi)).nonzero()
+        if idx.size == 0:
+            view.append(slice(0, x.size))
+        else:
+            # one more cell each side so contours reach the edge of view
+            view.append(slice(max(idx.min()-1, 0), min(idx.max()+2, x.size)))
+    ny = view[0].stop - view[0].start
+    nx = view[1].stop - view[1].start
+    # size of axes in screen pixels
+    bbox = ax.get_window_extent()
+    f = int(max(nx*lod_pixels/bbox.width, ny*lod_pixels/bbox.height))
+    f = max(1, min(f, nx//2, ny//2))
+    return view[0], view[1], f
+
+def block_average(a, f):
+    """ average a(lat,lon) over blocks of f x f cells, dropping the
+    remainder at the ends """
+    if f == 1:
+        return a
+    ny, nx = a.shape[0]//f, a.shape[1]//f
+    return a[:ny*f, :nx*f].reshape(ny, f, nx, f).mean(axis=(1, 3))
+
+def label_contours(cs):
+    """ label contours cs of map """
+    axs[0].clabel(cs, fontsize=8, inline=1, inline_spacing=10, fmt='%i',
+                  rightside_up=True, use_clabeltext=True)
+
+def update_map_plot():
+    # when dt slider changes or map is zoomed or panned
+    global cf1,cs11,cs12,cs13,lod_key,map_key
     dtidx = int(sdt.val)
-    lonidx = int(slon.val)
-
-    # find jet stream locations each time step
-    js = find_jets(d,dtidx,lm)
-    jsmap.set_ydata(d['lat'][js[:,JSLAT]])
-    jsmap.set_xdata(d['lon'][js[:,JSLON]])
-    
-    dt_str = d['dt'][dtidx].strftime("%Y_%m_%d_%H%M")
-    t1.set_text(dt_str)
-    lons, lats = np.meshgrid(d['lon'], d['lat'])
+    # contour only what is in view, averaged to the resolution of the screen
+    lats_s, lons_s, f = map_view(axs[0], d['lon'], d['lat'])
+    lod_key = (lats_s.start, lats_s.stop, lons_s.start, lons_s.stop, f)
+    # the same map is drawn already, e.g. when only jet params change
+    if (dtidx, lod_key, month, coarse) == map_key:
+        return
+    map_key = (dtidx, lod_key, month, coarse)
+    lons, lats = np.meshgrid(d['lon'][lons_s], d['lat'][lats_s])
+    lons, lats = block_average(lons, f), block_average(lats, f)
     # avg wspd between 100 and 400 hPa levels 
     (lev14,) = ((d['level']>=100) & (d['level']<=400)).nonzero()
-    wmap = np.mean(d['wspd'][dtidx,lev14,:,:], axis=0)
+    wmap = np.mean(d.take('wspd', dt=dtidx, lat=lats_s, lon=lons_s)[lev14].m, axis=0)
     # pick 300 hPa level of hgt
     (lev300,) = (d['level']==300).nonzero()
-    hmap = d['hgt'][dtidx,lev300,:,:].squeeze()
-    pmap = d['msl'][dtidx,:,:].squeeze()
+    hmap = d.take('hgt', dt=dtidx, lat=lats_s, lon=lons_s)[lev300[0]].m
+    pmap = d['msl'][dtidx,lats_s,lons_s].m
+    wmap, hmap, pmap = [block_average(a, f) for a in (wmap, hmap, pmap)]
     # remove previous all previous contours and labels
     c = cf1.collections
     c.extend(cs11.collections)
@@ -229,26 +308,46 @@ def update_both_plot(val):
     c.extend(cs13.collections)
     for tp in c:
         tp.remove()
-    l = cf1.clabel()
-    l.extend(cs11.clabel())
-    l.extend(cs12.clabel())
-    l.extend(cs13.clabel())
-    for lb in l:
-        lb.remove()
+    for cs in (cs11, cs12, cs13):
+        for lb in getattr(cs, 'labelTexts', []):
+            lb.remove()
     # plot filled contour for wmap(lon,lat)
     cf1 = axs[0].contourf(lons, lats, wmap, cflines, cmap=cmap)
     # contour lines for hmap(lon,lat) and pmap(lon,lat)
     cs11 = axs[0].contour(lons, lats, hmap, cslines1, colors='k', linewidths=1.0, linestyles='solid')
-    cs11_lab = axs[0].clabel(cs11, fontsize=8, inline=1, inline_spacing=10, fmt='%i',
-                             rightside_up=True, use_clabeltext=True)
+    label_contours(cs11)
     # contour lines for pmap(lon,lat) (low pmap<1013 dashed) (high pmap>1013 solid)
     # ever recorded lowest 870 hPa (typhoon), highest 1085 hPa
     cs12 = axs[0].contour(lons, lats, pmap, np.arange(870,1013,2),colors='gray', linewidths=1.0, linestyles='dashed')
-    cs12_lab = axs[0].clabel(cs12, fontsize=8, inline=1, inline_spacing=10, fmt='%i',
-                             rightside_up=True, use_clabeltext=True)
+    label_contours(cs12)
     cs13 = axs[0].contour(lons, lats, pmap, np.arange(1014,1085,2), colors='gray', linewidths=1.0, linestyles='solid')
-    cs13_lab = axs[0].clabel(cs13, fontsize=8, inline=1, inline_spacing=10, fmt='%i',
-                             rightside_up=True, use_clabeltext=True)
+    label_contours(cs13)
+
+def update_map_view(event):
+    # when map is drawn zoomed or panned, redraw contours if their grid changes
+    if lod_key is None:
+        # map not plotted yet
+        return
+    lats_s, lons_s, f = map_view(axs[0], d['lon'], d['lat'])
+    if (lats_s.start, lats_s.stop, lons_s.start, lons_s.stop, f) != lod_key:
+        update_map_plot()
+        fig.canvas.draw_idle()
+
+def update_both_plot(val):
+    # when dt slider changes
+    global js,jsmap
+    dtidx = int(sdt.val)
+
+    # find jet stream locations each time step
+    js = find_jets(d,dtidx,lm,backend)
+    jsmap.set_ydata(d['lat'][js[:,JSLAT]])
+    jsmap.set_xdata(d['lon'][js[:,JSLON]])
+    
+    dt_str = d['dt'][dtidx].strftime("%Y_%m_%d_%H%M")
+    if coarse:
+        dt_str += ' (coarse)'
+    t1.set_text(dt_str)
+    update_map_plot()
     # plt.draw()
     update_section_plot(val)
 
@@ -262,11 +361,32 @@ def next_lon(val):
 
 def prev_dt(val):
     dtidx = int(sdt.val)
-    sdt.set_val(dtidx-1)
+    if dtidx == 0:
+        # continue from last time step of previous month
+        show_month(shift_month(month, -1), -1)
+    else:
+        sdt.set_val(dtidx-1)
 
 def next_dt(val):
     dtidx = int(sdt.val)
-    sdt.set_val(dtidx+1)
+    if dtidx >= len(d['dt'])-1:
+        # continue from first time step of next month
+        show_month(shift_month(month, 1), 0)
+    else:
+        sdt.set_val(dtidx+1)
+
+def prev_month(val):
+    show_month(shift_month(month, -1), int(sdt.val))
+
+def next_month(val):
+    show_month(shift_month(month, 1), int(sdt.val))
+
+def select_month(val):
+    if scanf_datetime(val.strip(), fmt='%Y_%m') is None:
+        print(f"Month must be YYYY_MM, not {val}")
+        set_month_text(month)
+    else:
+        show_month(val.strip(), 0)
 
 def local_max_num_peaks(val):
     global lm
@@ -311,73 +431,91 @@ def toggle_jet_stream(val):
         cjs2.ax.set_facecolor('red')
     plt.draw()
 
-# outer grid to frame inner grid of gui, 
-# use the object handle of figure (fig) and method add_gridspec
-ogs = fig.add_gridspec(5,4, left=0.05, right=0.95,  top=0.95, bottom=0.05)
-# otherwise this direct call in jupyter-notebooks put the grid and widgets in new figure
-# ogs = gs.GridSpec(4,3, left=0.1, right=0.95,  top=0.95, bottom=0.05)
-
-# use top row of ogs for inner grids
-# ogs[0,0] for peak_local_max inputs
-# ogs[0,1] 
-# ogs[0,2] for lon and dt sliders
-# ogs[0,3] for next and prev button sets
-
-igs = gs.GridSpecFromSubplotSpec(4,2,subplot_spec=ogs[0,0], hspace=0.1)
-# local_peak_max input parameters
-# num_peaks
-text_np = TextBox(fig.add_subplot(igs[0,1], title='Local Maxima Detection'), 'num_peaks', initial=str(lm['num_peaks']))
-text_np.on_submit(local_max_num_peaks)
-# min_distance (and dilation of max_filter)
-text_md = TextBox(fig.add_subplot(igs[1,1]), 'min_distance', initial=str(lm['min_distance']))
-text_md.on_submit(local_max_min_distance)
-# exclude_border 
-text_exb = TextBox(fig.add_subplot(igs[2,1]), 'exclude_border', initial=str(lm['exclude_border']))
-text_exb.on_submit(local_max_exclude_border)
-# threshold_abs
-text_thresh = TextBox(fig.add_subplot(igs[3,1]), 'threshold (m/sec)', initial=str(lm['threshold_abs']))
-text_thresh.on_submit(local_max_threshold_abs)
-
-igs = gs.GridSpecFromSubplotSpec(4,2,subplot_spec=ogs[0,1], hspace=0.1)
-# further JS limitation hide/show
-cjs1 = Button(fig.add_subplot(igs[2:,0]), label='Limitation\nON', color='green', hovercolor='green')
-cjs1.on_clicked(toggle_limitation)
-# describe limitation in text
-# JS hide/show
-axbtn2 = fig.add_subplot(igs[0:2,0])
-cjs2 = Button(fig.add_subplot(igs[0:2,0]), 
-              label='Jet Stream\nON', color='green', hovercolor='green')
-cjs2.on_clicked(toggle_jet_stream)
-
-igs = gs.GridSpecFromSubplotSpec(4,1,subplot_spec=ogs[0,2], hspace=0.2)
-# Longitude slider
-# use the object handle of figure (fig) and method add_subplot to add
-axlon = fig.add_subplot(igs[0])
-slon = Slider(axlon, 'Long', 0, 100, valinit=0, valfmt='%d')
-slon.on_changed(update_section_plot)
-# Date slider
-axdt = fig.add_subplot(igs[1])
-sdt = Slider(axdt, 'Date', 0, 31*4, valinit=0, valfmt='%d')
-sdt.on_changed(update_both_plot)
-
-igs = gs.GridSpecFromSubplotSpec(4,4,subplot_spec=ogs[0,3], hspace=0.2)
-# Longitude prev button
-axlonprev = fig.add_subplot(igs[0,0])
-blonprev = Button(axlonprev, '<')
-blonprev.on_clicked(prev_lon)
-# Longitude next button
-axlonnext = fig.add_subplot(igs[0,1])
-blonnext = Button(axlonnext, '>')
-blonnext.on_clicked(next_lon)
-
-# Date prev button
-axdtprev = fig.add_subplot(igs[1,0])
-bdtprev = Button(axdtprev, '<')
-bdtprev.on_clicked(prev_dt)
-# Date next button
-axdtnext = fig.add_subplot(igs[1,1])
-bdtnext = Button(axdtnext, '>')
-bdtnext.on_clicked(next_dt)
+def setup_gui():
+    """ setup widgets for local max params, toggles, sliders and buttons
+    """
+    global text_np,text_md,text_exb,text_thresh,cjs1,cjs2,slon,sdt
+    global blonprev,blonnext,bdtprev,bdtnext,text_month,bmonprev,bmonnext
+    # outer grid to frame inner grid of gui, 
+    # use the object handle of figure (fig) and method add_gridspec
+    ogs = fig.add_gridspec(5,4, left=0.05, right=0.95,  top=0.95, bottom=0.05)
+    # otherwise this direct call in jupyter-notebooks put the grid and widgets in new figure
+    # ogs = gs.GridSpec(4,3, left=0.1, right=0.95,  top=0.95, bottom=0.05)
+
+    # use top row of ogs for inner grids
+    # ogs[0,0] for peak_local_max inputs
+    # ogs[0,1] 
+    # ogs[0,2] for lon and dt sliders
+    # ogs[0,3] for next and prev button sets
+
+    igs = gs.GridSpecFromSubplotSpec(4,2,subplot_spec=ogs[0,0], hspace=0.1)
+    # local_peak_max input parameters
+    # num_peaks
+    text_np = TextBox(fig.add_subplot(igs[0,1], title='Local Maxima Detection'), 'num_peaks', initial=str(lm['num_peaks']))
+    text_np.on_submit(local_max_num_peaks)
+    # min_distance (and dilation of max_filter)
+    text_md = TextBox(fig.add_subplot(igs[1,1]), 'min_distance', initial=str(lm['min_distance']))
+    text_md.on_submit(local_max_min_distance)
+    # exclude_border 
+    text_exb = TextBox(fig.add_subplot(igs[2,1]), 'exclude_border', initial=str(lm['exclude_border']))
+    text_exb.on_submit(local_max_exclude_border)
+    # threshold_abs
+    text_thresh = TextBox(fig.add_subplot(igs[3,1]), 'threshold (m/sec)', initial=str(lm['threshold_abs']))
+    text_thresh.on_submit(local_max_threshold_abs)
+
+    igs = gs.GridSpecFromSubplotSpec(4,2,subplot_spec=ogs[0,1], hspace=0.1)
+    # further JS limitation hide/show
+    cjs1 = Button(fig.add_subplot(igs[2:,0]), label='Limitation\nON', color='green', hovercolor='green')
+    cjs1.on_clicked(toggle_limitation)
+    # describe limitation in text
+    # JS hide/show
+    axbtn2 = fig.add_subplot(igs[0:2,0])
+    cjs2 = Button(fig.add_subplot(igs[0:2,0]), 
+                  label='Jet Stream\nON', color='green', hovercolor='green')
+    cjs2.on_clicked(toggle_jet_stream)
+
+    igs = gs.GridSpecFromSubplotSpec(4,1,subplot_spec=ogs[0,2], hspace=0.2)
+    # Longitude slider
+    # use the object handle of figure (fig) and method add_subplot to add
+    axlon = fig.add_subplot(igs[0])
+    slon = Slider(axlon, 'Long', 0, 100, valinit=0, valfmt='%d')
+    slon.on_changed(update_section_plot)
+    # Date slider
+    axdt = fig.add_subplot(igs[1])
+    sdt = Slider(axdt, 'Date', 0, 31*4, valinit=0, valfmt='%d')
+    sdt.on_changed(update_both_plot)
+    # Month selector
+    axmonth = fig.add_subplot(igs[2])
+    text_month = TextBox(axmonth, 'Month', initial=month)
+    text_month.on_submit(select_month)
+
+    igs = gs.GridSpecFromSubplotSpec(4,4,subplot_spec=ogs[0,3], hspace=0.2)
+    # Longitude prev button
+    axlonprev = fig.add_subplot(igs[0,0])
+    blonprev = Button(axlonprev, '<')
+    blonprev.on_clicked(prev_lon)
+    # Longitude next button
+    axlonnext = fig.add_subplot(igs[0,1])
+    blonnext = Button(axlonnext, '>')
+    blonnext.on_clicked(next_lon)
+
+    # Date prev button
+    axdtprev = fig.add_subplot(igs[1,0])
+    bdtprev = Button(axdtprev, '<')
+    bdtprev.on_clicked(prev_dt)
+    # Date next button
+    axdtnext = fig.add_subplot(igs[1,1])
+    bdtnext = Button(axdtnext, '>')
+    bdtnext.on_clicked(next_dt)
+
+    # Month prev button
+    axmonprev = fig.add_subplot(igs[2,0])
+    bmonprev = Button(axmonprev, '<')
+    bmonprev.on_clicked(prev_month)
+    # Month next button
+    axmonnext = fig.add_subplot(igs[2,1])
+    bmonnext = Button(axmonnext, '>')
+    bmonnext.on_clicked(next_month)
 
 
 def init_plot():
@@ -386,6 +524,8 @@ def init_plot():
     global js,jsmap,jsvec,cf1,cf2,cs11,cs12,cs13,cs2
     dtidx = 0
     lonidx = 65 # start lon on 75W
+    if coarse:
+        lonidx = lonidx // coarse['lon']
 
     dt_str = d['dt'][dtidx].strftime("%Y_%m_%d_%H%M")
     t1.set_text(dt_str)
@@ -410,23 +550,153 @@ def init_plot():
     cb.set_label('Wind Speed (m/sec)')
 
 
-if len(sys.argv)==2:
-    yyyy_mm = sys.argv[1]
-else:
-    yyyy_mm = '2018_01'
-
-BB['dt'] = find_months(yyyy_mm)
-BB_fig['dt'] = find_months(yyyy_mm)
-
 # input path of netcdf files
 # local data
-# indir = os.path.join('/data', 'era5', 'test')
-# d = get_data(indir, BB)
-
+# dapdir = os.path.join('/data', 'era5', 'test')
 # use data on dap server
 # dapdir = 'http://whewell.marine.unc.edu/dods/era5/test' # 10/60 N
 dapdir = 'http://whewell.marine.unc.edu/dods/era5' # 0/80 N
-d = get_data(dapdir, BB)
 
-init_plot()
-plt.draw()
+def load_data(yyyy_mm, stride=None):
+    """ get data for year and month (yyyy_mm) within BB into d,
+    or every n-th time and lat/lon as given by stride (see get_data)
+    """
+    global d, coarse, month
+    BB['dt'] = find_months(yyyy_mm)
+    BB_fig['dt'] = find_months(yyyy_mm)
+    d = get_data(dapdir, BB, stride=stride, budget=budget)
+    coarse = stride
+    month = yyyy_mm
+    if not coarse:
+        # keep as loaded month
+        months[month] = Future()
+        months[month].set_result(d)
+
+def fetch_month(yyyy_mm):
+    """ future of full resolution data for yyyy_mm, loaded in the
+    background unless already loaded or being loaded
+    """
+    if yyyy_mm in months:
+        months.move_to_end(yyyy_mm)
+    else:
+        months[yyyy_mm] = loader.submit(get_data, dapdir, dict(BB, dt=find_months(yyyy_mm)),
+                                         budget=budget)
+    # forget least recently shown months beyond max_months, except this
+    # one and the month shown with its neighbors, so prefetching one
+    # neighbor never cancels the other
+    keep = [yyyy_mm, month, shift_month(month, -1), shift_month(month, 1)]
+    for old in list(months.keys()):
+        if len(months) <= max_months:
+            break
+        if old not in keep:
+            months.pop(old).cancel()
+    return months[yyyy_mm]
+
+def prefetch_months():
+    """ load previous and next months in the background """
+    fetch_month(shift_month(month, 1))
+    fetch_month(shift_month(month, -1))
+
+def set_month_text(yyyy_mm):
+    """ show yyyy_mm in month selector without submitting it """
+    text_month.eventson = False
+    text_month.set_val(yyyy_mm)
+    text_month.eventson = True
+
+def show_month(yyyy_mm, dtidx=0):
+    """ swap in data of another month and show time step dtidx
+    (-1 for last) at the same longitude, then prefetch its neighbors
+    """
+    global d, coarse, month, full_data
+    try:
+        # returns at once when prefetched
+        new = fetch_month(yyyy_mm).result()
+    except Exception as e:
+        print(f"Loading {yyyy_mm} failed: {e!r}")
+        months.pop(yyyy_mm, None)
+        set_month_text(month)
+        return
+    if len(new['dt']) == 0:
+        print(f"No data for {yyyy_mm}")
+        set_month_text(month)
+        return
+    if timer is not None:
+        timer.stop()
+    lonidx = int(slon.val) * (coarse['lon'] if coarse else 1)
+    d, coarse, month, full_data = new, None, yyyy_mm, None
+    BB['dt'] = find_months(month)
+    BB_fig['dt'] = find_months(month)
+    set_month_text(month)
+
+    if dtidx < 0:
+        dtidx = len(d['dt'])-1
+    slon.valmax = len(d['lon'])-1
+    sdt.valmax = len(d['dt'])-1
+    # set both before a single update, js is found again for the new d
+    for slider, val in ((slon, min(lonidx, slon.valmax)), (sdt, min(dtidx, sdt.valmax))):
+        slider.eventson = False
+        slider.set_val(val)
+        slider.eventson = True
+    update_both_plot(0)
+    prefetch_months()
+
+def load_full_data():
+    """ start loading full resolution of d in the background and check
+    for it with a timer (see swap_full_data)
+    """
+    global full_data, timer
+    full_data = fetch_month(month)
+    timer = fig.canvas.new_timer(interval=500)
+    timer.add_callback(swap_full_data)
+    timer.start()
+
+def swap_full_data():
+    """ when full resolution is loaded, replace coarse d and refresh the
+    current time and longitude
+    """
+    if full_data is None or not full_data.done():
+        return
+    timer.stop()
+    # coarse index i is full index i*stride from the same start
+    show_month(month, int(sdt.val) * coarse['dt'])
+
+def main():
+    """ get coastlines and data, then build and initialize the figure
+    """
+    global lines, backend, loader, max_months
+    parser = argparse.ArgumentParser(description='Jetstream vizualization (jsviz) tool')
+    parser.add_argument('yyyy_mm', nargs='?', default='2018_01', help='year and month to view')
+    parser.add_argument('--backend', default='skimage', choices=list(jet_backends.keys()),
+                        help='jet detection backend')
+    parser.add_argument('--progressive', type=int, default=0, metavar='N',
+                        help='first show every N-th time step on a coarser grid, '
+                             'then full resolution when loaded in the background')
+    parser.add_argument('--coarse-grid', type=int, default=2, metavar='K',
+                        help='with --progressive, first show every K-th lat and lon')
+    parser.add_argument('--max-months', type=int, default=3,
+                        help='number of months kept in memory, with previous and next prefetched '
+                             '(those of the month shown are kept however few)')
+    args = parser.parse_args()
+    backend = args.backend
+    max_months = max(1, args.max_months)
+    # one thread, since the netcdf library is not thread safe
+    loader = ThreadPoolExecutor(max_workers=1)
+
+    # grab the coastline dataset
+    lines = get_coastlines()
+    if args.progressive:
+        load_data(args.yyyy_mm, dict(dt=args.progressive, lat=args.coarse_grid,
+                                     lon=args.coarse_grid))
+    else:
+        load_data(args.yyyy_mm)
+
+    setup_figure()
+    setup_gui()
+    init_plot()
+    plt.draw()
+    if coarse:
+        load_full_data()
+    prefetch_months()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Small synthetic ERA5 files (param.YYYY.nc) for the tests
+
+A global 5 deg grid of a few time steps of January 2018, with a wavy
+jet near 40N and a weaker one near 25N, written like the source files
+(packed shorts, chunked by time step).
+"""
+
+import os
+import sys
+import datetime
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def write_era5(indir, lon=np.arange(-180., 180., 5.), lat=np.arange(80., -0.1, -5.),
+               level=np.array([100, 150, 200, 250, 300, 400, 500]), nt=6, noise=1.0, seed=0):
+    """Write hgt, uwnd, vwnd and msl files of the synthetic grid to indir
+
+    Returns
+    -------
+    indir : str
+    """
+    import netCDF4
+    rng = np.random.default_rng(seed)
+    times = [datetime.datetime(2018, 1, 1) + datetime.timedelta(hours=6*i) for i in range(nt)]
+    LAT = lat[None,None,:,None]
+    LON = lon[None,None,None,:]
+    LEV = level[None,:,None,None]
+    T = np.arange(nt)[:,None,None,None]
+    jetlat = 40 + 10*np.sin(np.radians(LON)*2 + T*0.2)
+    u = (60*np.exp(-((LAT-jetlat)/6)**2)*np.exp(-((LEV-250)/120)**2)
+         + 35*np.exp(-((LAT-25)/4)**2)*np.exp(-((LEV-200)/80)**2)
+         + rng.normal(0, noise, (nt, len(level), len(lat), len(lon))))
+    v = 10*np.sin(np.radians(LON)*3)*np.ones_like(u)
+    z = 9.80665*(16000*np.log(1000/LEV) + 100*np.cos(np.radians(LAT)))*np.ones_like(u)
+    msl = (101325 + 1500*np.sin(np.radians(LON[:,0])*2 + T[:,0]*0.1)*np.cos(np.radians(LAT[:,0]))
+           *np.ones((nt, len(lat), len(lon))))
+
+    def write(param, varname, data, units, press=True):
+        nc = netCDF4.Dataset(os.path.join(indir, '%s.2018.nc' % param), 'w')
+        nc.createDimension('time', None)
+        nc.createDimension('latitude', len(lat))
+        nc.createDimension('longitude', len(lon))
+        t = nc.createVariable('time', 'i4', ('time',))
+        t.units = 'hours since 1900-01-01 00:00:00.0'
+        t.calendar = 'gregorian'
+        t[:] = netCDF4.date2num(times, t.units, t.calendar)
+        nc.createVariable('latitude', 'f4', ('latitude',))[:] = lat
+        nc.createVariable('longitude', 'f4', ('longitude',))[:] = lon
+        dims = ('time', 'latitude', 'longitude')
+        if press:
+            nc.createDimension('level', len(level))
+            lv = nc.createVariable('level', 'i4', ('level',))
+            lv[:] = level
+            lv.units = 'millibars'
+            dims = ('time', 'level', 'latitude', 'longitude')
+        var = nc.createVariable(varname, 'i2', dims, chunksizes=(1,)+data.shape[1:])
+        var.scale_factor = (data.max() - data.min())/60000
+        var.add_offset = (data.max() + data.min())/2
+        var.units = units
+        var[:] = data
+        nc.close()
+
+    write('uwnd', 'u', u, 'm s**-1')
+    write('vwnd', 'v', v, 'm s**-1')
+    write('hgt', 'z', z, 'm**2 s**-2')
+    write('msl', 'msl', msl, 'Pa', press=False)
+    return str(indir)
+
+@pytest.fixture(scope='session')
+def era5dir(tmp_path_factory):
+    """Directory of the synthetic files, shared by the tests"""
+    return write_era5(tmp_path_factory.mktemp('era5'))
@@ -0,0 +1,61 @@
+"""The 'numba' backend of find_jets() finds the jets of the 'skimage' one"""
+
+import io
+import contextlib
+
+import numpy as np
+import pytest
+
+from conftest import write_era5
+from jsutil import get_data, find_months, compare_jets, jet_params
+
+def data(indir):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return get_data(indir, dict(lon=[-180, 180], lat=[0, 80], lvl=[100, 500],
+                                    dt=find_months('2018_01')))
+
+def compare(d, p):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return compare_jets(d, p)
+
+@pytest.fixture(scope='module')
+def noisy(tmp_path_factory):
+    """Data with noise as strong as the jets, for many peaks and regions with holes"""
+    return data(write_era5(tmp_path_factory.mktemp('noisy'), noise=12.0, seed=1))
+
+def random_params(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [dict(jet_params, num_peaks=int(rng.integers(1, 8)),
+                 min_distance=int(rng.integers(0, 4)),
+                 threshold_abs=float(rng.uniform(20, 50)),
+                 peaks_inside_threshold=float(rng.uniform(15, 40))) for i in range(n)]
+
+def test_same_on_smooth_jets(tmp_path):
+    d = data(write_era5(tmp_path, noise=0.))
+    diff = compare(d, jet_params)
+    assert diff['same'] and diff['counts'][0] > 0
+
+def test_same_without_limitation(noisy):
+    for p in random_params(6):
+        diff = compare(noisy, dict(p, peaks_inside_toggle=0))
+        assert diff['same'], p
+
+def test_differ_next_to_holes(noisy):
+    from scipy import ndimage
+    wspd = noisy['wspd'].m
+    nskimage = 0
+    for p in random_params(8):
+        diff = compare(noisy, p)
+        # numba keeps no jet that skimage does not
+        assert len(diff['only_1']) == 0, p
+        # skimage also keeps the max peak within the contour of each hole
+        # of a region, which numba does not (see jsnumba)
+        for dtidx, lvlidx, latidx, lonidx in diff['only_0']:
+            label, n = ndimage.label(wspd[dtidx,:,:,lonidx] > p['peaks_inside_threshold'],
+                                     structure=np.ones((3, 3)))
+            region = label == label[lvlidx, latidx]
+            holes = ndimage.binary_fill_holes(region) & ~region
+            assert ndimage.binary_dilation(holes, structure=np.ones((3, 3)))[lvlidx, latidx]
+        nskimage += len(diff['only_0'])
+    # the case arises on these fields
+    assert nskimage > 0
@@ -0,0 +1,98 @@
+"""Catalogs written, appended and read back as text and binary (.npy)"""
+
+import os
+import datetime
+
+import numpy as np
+import pytest
+
+from jscat import catalog_header
+from jsutil import (write_jet_data, write_jet_records, jet_records, append_jet_data,
+                    read_jet_data, last_jet_time, catalog_lock)
+
+TYPES = 'JSLVL JSLAT JSLON JSHT WSPD UWND VWND HGT'
+
+def table(nt, n=3, seed=0):
+    """Jets like those of jet_table(), n at each of nt times from 2018-01-01"""
+    rng = np.random.default_rng(seed)
+    t0 = datetime.datetime(2018, 1, 1)
+    dt = [(t0 + datetime.timedelta(hours=6*(i//n))).strftime("  %Y %m %d %H %M %S")
+          for i in range(nt*n)]
+    values = rng.uniform(-100, 100, (nt*n, len(TYPES.split())))
+    return np.column_stack((np.array(dt, dtype='U25'), values))
+
+def write(ofn, js):
+    """Write js as a text or binary catalog, by the extension of ofn"""
+    if ofn.endswith('.npy'):
+        write_jet_records(ofn, jet_records(js, TYPES))
+    else:
+        header = catalog_header('2018_01', dict(lat=[0, 80], lon=[-140, -50], lvl=[100, 500]),
+                                [datetime.datetime(2018, 1, 1), datetime.datetime(2018, 2, 1)], TYPES)
+        write_jet_data(ofn, header, js)
+
+@pytest.mark.parametrize('ext', ['txt', 'npy'])
+def test_round_trip(tmp_path, ext):
+    js = table(10)
+    ofn = str(tmp_path/('js_2018_01.' + ext))
+    write(ofn, js)
+    recs = read_jet_data(ofn)
+    assert isinstance(recs, np.memmap)
+    assert list(recs.dtype.names) == ['JSDT'] + TYPES.split()
+    assert list(recs['JSDT'].astype(datetime.datetime)) == \
+        [datetime.datetime(*map(int, s.split())) for s in js[:,0]]
+    for i, name in enumerate(TYPES.split()):
+        assert np.allclose(recs[name], js[:,1+i].astype(float), rtol=0, atol=1e-12)
+    # no temp files left
+    assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(ofn)] +
+                                                   ([os.path.basename(ofn) + '.npy'] if ext == 'txt' else []))
+
+def test_text_cache(tmp_path):
+    ofn = str(tmp_path/'js_2018_01.txt')
+    write(ofn, table(4))
+    parsed = read_jet_data(ofn, cache=False)
+    assert not os.path.exists(ofn + '.npy')
+    cached = read_jet_data(ofn)
+    assert os.path.exists(ofn + '.npy')
+    assert np.array_equal(read_jet_data(ofn), parsed) and np.array_equal(cached, parsed)
+    # a changed catalog is parsed again
+    write(ofn, table(5))
+    os.utime(ofn, (os.path.getmtime(ofn + '.npy') + 1,)*2)
+    assert len(read_jet_data(ofn)) == 15
+
+@pytest.mark.parametrize('ext', ['txt', 'npy'])
+def test_append(tmp_path, ext):
+    js = table(12)
+    whole = str(tmp_path/('whole.' + ext))
+    parts = str(tmp_path/('parts.' + ext))
+    write(whole, js)
+    write(parts, js[:9])
+    append_jet_data(parts, js[9:21], TYPES)
+    append_jet_data(parts, js[21:], TYPES)
+    # nothing to append
+    append_jet_data(parts, js[:0], TYPES)
+    if ext == 'txt':
+        assert open(parts).read() == open(whole).read()
+    else:
+        assert np.array_equal(np.load(parts), np.load(whole))
+
+@pytest.mark.parametrize('ext', ['txt', 'npy'])
+def test_last_jet_time(tmp_path, ext):
+    ofn = str(tmp_path/('js_2018_01.' + ext))
+    write(ofn, table(0))
+    assert last_jet_time(ofn) is None
+    write(ofn, table(1))
+    assert last_jet_time(ofn) == datetime.datetime(2018, 1, 1)
+    # only the end of a long catalog is read, its first line cut
+    write(ofn, table(40))
+    assert os.path.getsize(ofn) > 4096
+    assert last_jet_time(ofn) == datetime.datetime(2018, 1, 10, 18)
+
+def test_catalog_lock(tmp_path):
+    fcntl = pytest.importorskip('fcntl')
+    ofn = str(tmp_path/'js_2018_01.txt')
+    with catalog_lock(ofn):
+        with open(ofn + '.lock') as f:
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    with open(ofn + '.lock') as f:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
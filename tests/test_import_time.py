@@ -0,0 +1,39 @@
+"""Importing jsutil and jsviz is quick and does not import the heavy
+dependencies, which are imported on first use (see jsutil)"""
+
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ['netCDF4', 'metpy', 'skimage', 'cv2', 'numba']
+
+def import_module(name):
+    """Import name in a new interpreter
+
+    Returns
+    -------
+    seconds : float
+       cumulative import time of name, from -X importtime
+    heavy : list
+       the HEAVY modules imported with it
+    """
+    code = "import sys, %s; print(' '.join(m for m in %r if m in sys.modules))" % (name, HEAVY)
+    env = dict(os.environ, MPLBACKEND='Agg')
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                         env=env, capture_output=True, text=True, check=True)
+    # lines are "import time: self [us] | cumulative | imported package"
+    (line,) = [l for l in out.stderr.splitlines() if l.split('|')[-1].strip() == name]
+    seconds = int(line.split('|')[1]) / 1e6
+    return seconds, out.stdout.split()
+
+def test_import_jsutil():
+    seconds, heavy = import_module('jsutil')
+    assert heavy == []
+    assert seconds < 1.0
+
+def test_import_jsviz():
+    seconds, heavy = import_module('jsviz')
+    assert heavy == []
+    assert seconds < 3.0
@@ -0,0 +1,22 @@
+"""Job ids and checks of jobs submitted to jscatd"""
+
+import pytest
+
+import jscatd
+
+def test_job_id_defaults():
+    job = dict(yyyy_mm='2018_01')
+    written_out = dict(yyyy_mm='2018_01', lon=[-140., -50], lat=[0, 80], lvl=[100, 500],
+                       lm=dict(threshold_abs=40), tile_size=None, backend='skimage')
+    assert jscatd.job_id(job) == jscatd.job_id(written_out)
+    for other in [dict(lm=dict(threshold_abs=35.)), dict(backend='numba'), dict(tile_size=30),
+                  dict(lon=[-140, -60]), dict(yyyy_mm='2018_02')]:
+        assert jscatd.job_id(dict(job, **other)) != jscatd.job_id(job)
+
+@pytest.mark.parametrize('job', [dict(), dict(yyyy_mm='2018-01'), dict(yyyy_mm='2018_01', backend='cuda'),
+                                 dict(yyyy_mm='2018_01', lon=5), dict(yyyy_mm='2018_01', lm=[1])])
+def test_submit_refuses(tmp_path, job):
+    q = jscatd.JobQueue(str(tmp_path), workers=1)
+    with pytest.raises(ValueError):
+        q.submit(job)
+    q.pool.shutdown()
@@ -0,0 +1,87 @@
+"""Longitude ranges across the dateline, tiles and the catalogs of tiles"""
+
+import os
+
+import numpy as np
+import pytest
+
+import jscat
+from jsutil import lon_index, lon_tiles, lon_union
+
+LON180 = np.arange(-180., 180., 5.)
+LON360 = np.arange(0., 360., 5.)
+
+def test_lon_index_within():
+    lonidx = lon_index(LON180, [-140, -50])
+    assert list(LON180[lonidx]) == list(np.arange(-140., -49., 5.))
+
+def test_lon_index_half_open():
+    lonidx = lon_index(LON180, [-140, -50], closed=False)
+    assert LON180[lonidx][-1] == -55.
+
+@pytest.mark.parametrize('lon', [LON180, LON360])
+def test_lon_index_across_dateline(lon):
+    # eastward from 150 as one run, in either convention of the grid
+    lonidx = lon_index(lon, [150, -130])
+    assert list((lon[lonidx] - 150.) % 360.) == list(np.arange(0., 81., 5.))
+    lonidx = lon_index(lon, [150, 230], closed=False)
+    assert list((lon[lonidx] - 150.) % 360.) == list(np.arange(0., 80., 5.))
+
+@pytest.mark.parametrize('lon_range', [[-180, 180], [0, 360], [-30, 330]])
+def test_lon_index_globe(lon_range):
+    # the whole globe is half-open, each lon once
+    lonidx = lon_index(LON180, lon_range)
+    assert sorted(lonidx) == list(range(len(LON180)))
+    assert (LON180[lonidx[0]] - lon_range[0]) % 360. == 0.
+
+def test_lon_tiles():
+    tiles = lon_tiles([-140, -50], 40)
+    assert [t['lon'] for t in tiles] == [[-140, -100], [-100, -60], [-60, -50]]
+    # only the last tile is closed
+    assert [t['closed'] for t in tiles] == [False, False, True]
+
+def test_lon_tiles_convention():
+    # tiles past 180 of a -180 to 180 range switch to negative lon
+    tiles = lon_tiles([150, -130], 30)
+    assert [t['lon'] for t in tiles] == [[150, 180], [-180, -150], [-150, -130]]
+    assert [t['closed'] for t in tiles] == [False, False, True]
+    # a 0 to 360 range keeps its convention
+    tiles = lon_tiles([150, 230], 30)
+    assert [t['lon'] for t in tiles] == [[150, 180], [180, 210], [210, 230]]
+
+def test_lon_tiles_globe():
+    tiles = lon_tiles([-180, 180], 90)
+    assert [t['lon'] for t in tiles] == [[-180, -90], [-90, 0], [0, 90], [90, 180]]
+    # no tile is closed, so -180 (180) is in the first only
+    assert not any(t['closed'] for t in tiles)
+
+def test_tiles_cover_each_lon_once():
+    for lon_range, size in [([-180, 180], 30), ([150, -130], 25), ([-140, -50], 40)]:
+        tiles = lon_tiles(lon_range, size)
+        idx = np.concatenate([lon_index(LON180, t['lon'], t['closed']) for t in tiles])
+        assert list(idx) == list(lon_index(LON180, lon_range))
+
+def test_lon_union():
+    assert lon_union([[-140, -50], [-80, 0]]) == [-140, 0.]
+    assert lon_union([[-140, -50], [140, -120]]) == [140, -50.]
+    assert lon_union([[-80, 0], [140, -120], [-140, -50]]) == [140, 0.]
+    assert lon_union([[10, 20]]) == [10, 20.]
+    # ranges that need the whole globe
+    assert lon_union([[0, 200], [180, 10]]) == [0, 360.]
+
+def catalog(outdir, lon, **kwargs):
+    """Text of the catalog of January 2018 within lon of the synthetic files"""
+    os.makedirs(outdir)
+    BB = dict(lon=lon, lat=[0, 80], lvl=[100, 500])
+    ofn = jscat.do_jscat('2018_01', str(outdir), BB=BB, **kwargs)
+    with open(ofn) as f:
+        return f.read()
+
+@pytest.mark.parametrize('lon', [[-180, 180], [150, -130]])
+def test_tiled_catalog_is_flat_catalog(era5dir, tmp_path, monkeypatch, lon):
+    monkeypatch.setattr(jscat, 'dapdir', era5dir)
+    flat = catalog(tmp_path/'flat', lon)
+    assert len(flat.splitlines()) > 20
+    for name, kwargs in [('tiled', dict(tile_size=30)),
+                         ('read', dict(tile_size=40, read_workers=2))]:
+        assert catalog(tmp_path/name, lon, **kwargs) == flat
@@ -0,0 +1,59 @@
+"""Hyperslab reads (read_subset) equal fancy-indexed reads of the source"""
+
+import os
+
+import numpy as np
+import pytest
+
+from jsutil import index_slices, split_slice, read_subset, lon_index
+
+def test_index_slices():
+    assert index_slices([4, 5, 6, 7]) == [slice(4, 8, 1)]
+    assert index_slices([140, 142, 144, 0, 2]) == [slice(140, 145, 2), slice(0, 3, 2)]
+    assert index_slices([3]) == [slice(3, 4, 1)]
+    assert index_slices([]) == []
+    # steps that change start a new slice
+    assert index_slices([0, 1, 2, 4, 6, 7]) == [slice(0, 3, 1), slice(4, 7, 2), slice(7, 8, 1)]
+
+@pytest.mark.parametrize('s', [slice(0, 10, 1), slice(3, 17, 1), slice(1, 20, 3), slice(5, 6, 4)])
+def test_split_slice(s):
+    parts = split_slice(s, 4)
+    # the same indices, in parts within multiples of 4
+    assert [i for p in parts for i in range(p.start, p.stop, p.step)] == list(range(s.start, s.stop, s.step))
+    assert all(p.start//4 == (p.stop-1)//4 for p in parts)
+
+def indices(nc, lon_range, stride=1):
+    """Index arrays of uwnd: every other time, some levels, lat and lon
+    within lon_range, every stride-th"""
+    lon = nc.variables['longitude'][:]
+    return [np.arange(0, len(nc.dimensions['time']), 2)[::stride],
+            np.array([1, 2, 3, 4]),
+            np.arange(2, 15)[::stride],
+            lon_index(lon, lon_range)[::stride]]
+
+@pytest.mark.parametrize('lon_range', [[-140, -50], [150, -130], [-180, 180]])
+@pytest.mark.parametrize('stride', [1, 2])
+@pytest.mark.parametrize('workers', [1, 2])
+def test_read_subset(era5dir, lon_range, stride, workers):
+    import netCDF4
+    nc = netCDF4.Dataset(os.path.join(era5dir, 'uwnd.2018.nc'))
+    idx = indices(nc, lon_range, stride)
+    ref = np.ma.getdata(nc.variables['u'][:])[np.ix_(*idx)]
+    # small requests, so the time dim is split among workers
+    data, stats = read_subset(nc, 'u', idx, workers, max_request_bytes=2**8)
+    nc.close()
+    assert data.shape == ref.shape
+    assert np.array_equal(data, ref)
+    assert stats['requests'] > 1
+
+def test_read_subset_bytes(era5dir):
+    import netCDF4
+    nc = netCDF4.Dataset(os.path.join(era5dir, 'uwnd.2018.nc'))
+    idx = [np.arange(3), np.array([1, 2, 3, 4]), np.arange(2, 15), np.arange(8, 27)]
+    data, stats = read_subset(nc, 'u', idx)
+    assert stats['bytes'] == data.size * 2
+    # a local strided slab is read as its whole block
+    idx = [np.array([0]), np.array([1]), np.arange(2, 15, 2), np.arange(0, 10, 3)]
+    data, stats = read_subset(nc, 'u', idx)
+    nc.close()
+    assert stats['bytes'] == 13 * 10 * 2 > data.size * 2